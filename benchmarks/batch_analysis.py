@@ -0,0 +1,92 @@
+"""analyze_kf2_stats の1件ずつのループと列指向の analyze_frame を比較する
+
+使い方:
+    $ python benchmarks/batch_analysis.py [--rows 10000] [--runs 3] [--seed 0]
+
+合成した戦績で両方を実行し、全行の結果が一致することを確認してから所要時間を表示する。
+ランキング（kf2core.leaderboard）の指標の値を求める2通りの方法も同じように比べる。
+読み直す人数によってどちらが速いかが変わるので、--rows を変えて BATCH_MIN_PLAYERS の目安にする。
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+from kf2core.analysis import STAT_INDEX, analyze_kf2_stats
+from kf2core.batch import analyze_frame, to_analysis
+from kf2core.constants import CUMULATIVE_XP_PER_LEVEL, PERK_STAT_IDS
+from kf2core.leaderboard import frame_metric_values, metric_values
+
+
+def make_stats(rng):
+    """実際のレスポンスに近い stats_dict を1件作る（分析で使わない統計も含める）"""
+    stats = {f"1_{stat_id}": rng.randrange(0, 5000) for stat_id in range(1, 400) if rng.random() < 0.6}
+    for ids in PERK_STAT_IDS.values():
+        # 未プレイ・途中・最大レベル・上限超えを混ぜる
+        xp = rng.choice([0, rng.randrange(1, CUMULATIVE_XP_PER_LEVEL[-1]), CUMULATIVE_XP_PER_LEVEL[-1], 9_999_999])
+        stats[f"1_{ids['progress']}"] = xp if rng.random() < 0.8 else 0
+        stats[f"1_{ids['build']}"] = xp
+    return stats
+
+
+def timed(func, runs):
+    """func を runs 回実行し、(最後の結果, 所要時間[ms]のリスト) を返す"""
+    elapsed = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    stats_list = [make_stats(rng) for _ in range(args.rows)]
+    stats_frame = pd.DataFrame(stats_list).fillna(0).astype("int64")
+    matrix = STAT_INDEX.matrix(stats_list)
+
+    expected, loop_ms = timed(lambda: [analyze_kf2_stats(stats) for stats in stats_list], args.runs)
+    cases = [
+        ("analyze_frame(list[dict])", lambda: analyze_frame(stats_list)),
+        ("analyze_frame(DataFrame)", lambda: analyze_frame(stats_frame)),
+        ("analyze_frame(matrix)", lambda: analyze_frame(matrix)),
+    ]
+
+    baseline = statistics.median(loop_ms)
+    print(f"{args.rows} 件 × {args.runs} 回（中央値）")
+    print(f"  {'analyze_kf2_stats ループ':<28} {baseline:9.1f} ms")
+    for label, func in cases:
+        frame, elapsed = timed(func, args.runs)
+        mismatches = sum(to_analysis(row) != analysis for (_, row), analysis in zip(frame.iterrows(), expected))
+        if mismatches:
+            sys.exit(f"{label}: {mismatches} 件の結果が analyze_kf2_stats と一致しません")
+        median = statistics.median(elapsed)
+        print(f"  {label:<28} {median:9.1f} ms  ({baseline / median:5.1f}x)")
+
+    expected, loop_ms = timed(lambda: [metric_values(analyze_kf2_stats(stats)) for stats in stats_list], args.runs)
+    values, frame_ms = timed(lambda: frame_metric_values(analyze_frame(stats_list)), args.runs)
+    if values != expected:
+        sys.exit("frame_metric_values の結果が metric_values と一致しません")
+    baseline = statistics.median(loop_ms)
+    median = statistics.median(frame_ms)
+    print("ランキングの指標")
+    print(f"  {'metric_values ループ':<28} {baseline:9.1f} ms")
+    print(f"  {'frame_metric_values':<28} {median:9.1f} ms  ({baseline / median:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
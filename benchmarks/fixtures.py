@@ -0,0 +1,167 @@
+"""ベンチマーク用のSteam APIレスポンス（フィクスチャ）の生成・記録・読み込み
+
+使い方:
+    $ python benchmarks/fixtures.py generate            # 合成フィクスチャを書き出す
+    $ STEAM_API_KEY=<APIキー> python benchmarks/fixtures.py record typical <SteamID64>
+
+フィクスチャは benchmarks/fixtures/<プロファイル>/ に、エンドポイントごとの JSON として置く。
+record は実際のレスポンスをそのまま保存する（SteamIDを含むためコミットしないこと）。
+ファイルがないプロファイルは、同じシードから毎回同じ合成データを作って使う。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kf2core.analysis import STAT_INDEX
+from kf2core.constants import GAME_APP_IDS, PERK_STAT_IDS
+from kf2core.schema import SCHEMA_PATH
+from kf2core.steam_client import steam_client
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+APP_ID = GAME_APP_IDS["Killing Floor 2"]
+STEAM_ID = "76561198000000000"
+
+# エンドポイントのパス → フィクスチャのファイル名
+ENDPOINTS = {
+    "ISteamUserStats/GetUserStatsForGame/v0002/": "user_stats.json",
+    "IPlayerService/GetOwnedGames/v0001/": "owned_games.json",
+    SCHEMA_PATH: "schema.json",
+}
+
+# 合成データの規模（統計数・解除済み実績数・スキーマの統計数と実績数・所有ゲーム数・Perkの最大XP）
+PROFILES = {
+    "small": {"stats": 120, "achieved": 15, "schema_stats": 400, "schema_achievements": 300, "owned_games": 8, "max_xp": 30_000},
+    "typical": {"stats": 600, "achieved": 140, "schema_stats": 1_200, "schema_achievements": 300, "owned_games": 300, "max_xp": 280_000},
+    "huge": {"stats": 2_500, "achieved": 300, "schema_stats": 4_000, "schema_achievements": 1_000, "owned_games": 12_000, "max_xp": 2_000_000},
+}
+
+
+def generate(profile, seed=0):
+    """プロファイルの規模で {エンドポイント: レスポンス} を合成する"""
+    size = PROFILES[profile]
+    rng = random.Random(f"{profile}-{seed}")
+
+    # 分析で参照する統計は必ず含め、残りは実際のレスポンスのように無関係な統計で埋める
+    stats = {int(stat_id): rng.randrange(0, 50_000) for stat_id in STAT_INDEX.stat_ids}
+    for ids in PERK_STAT_IDS.values():
+        xp = rng.randrange(0, size["max_xp"]) if rng.random() < 0.8 else 0
+        stats[ids["progress"]] = stats[ids["build"]] = xp
+    filler = iter(range(10_000, 10_000 + size["schema_stats"]))
+    while len(stats) < size["stats"]:
+        stats[next(filler)] = rng.randrange(0, 1_000_000)
+
+    achievement_names = [f"KFACHIEVEMENT_{i:04d}" for i in range(size["schema_achievements"])]
+    user_stats = {
+        "playerstats": {
+            "steamID": STEAM_ID,
+            "gameName": "Killing Floor 2",
+            "stats": [{"name": f"1_{stat_id}", "value": value} for stat_id, value in sorted(stats.items())],
+            "achievements": [{"name": name, "achieved": 1} for name in rng.sample(achievement_names, size["achieved"])],
+        }
+    }
+
+    games = [
+        {"appid": 1_000_000 + i, "playtime_forever": rng.randrange(0, 50_000), "playtime_2weeks": 0,
+         "playtime_windows_forever": 0, "playtime_mac_forever": 0, "playtime_linux_forever": 0,
+         "rtime_last_played": 1_700_000_000, "playtime_disconnected": 0}
+        for i in range(size["owned_games"] - 1)
+    ]
+    games.insert(rng.randrange(0, len(games) + 1), {"appid": APP_ID, "playtime_forever": rng.randrange(60, 200_000)})
+    owned_games = {"response": {"game_count": len(games), "games": games}}
+
+    icon_base = "https://steamcdn-a.akamaihd.net/steamcommunity/public/images/apps/232090/"
+    schema = {
+        "game": {
+            "gameName": "Killing Floor 2",
+            "gameVersion": "1",
+            "availableGameStats": {
+                "stats": [
+                    {"name": f"1_{stat_id}", "defaultvalue": 0, "displayName": f"Stat {stat_id}"}
+                    for stat_id in sorted(set(stats) | set(range(1, size["schema_stats"])))
+                ],
+                "achievements": [
+                    {"name": name, "defaultvalue": 0, "displayName": f"Achievement {i}", "hidden": 0,
+                     "description": f"Complete objective number {i}.",
+                     "icon": f"{icon_base}{i:040x}.jpg", "icongray": f"{icon_base}{i:040x}_gray.jpg"}
+                    for i, name in enumerate(achievement_names)
+                ],
+            },
+        }
+    }
+
+    return {
+        "ISteamUserStats/GetUserStatsForGame/v0002/": user_stats,
+        "IPlayerService/GetOwnedGames/v0001/": owned_games,
+        SCHEMA_PATH: schema,
+    }
+
+
+def load(profile):
+    """保存済みのフィクスチャを読み込む。なければ合成する"""
+    directory = FIXTURES_DIR / profile
+    if not directory.is_dir():
+        return generate(profile)
+    fixtures = {}
+    for path, filename in ENDPOINTS.items():
+        with open(directory / filename, encoding="utf-8") as f:
+            fixtures[path] = json.load(f)
+    return fixtures
+
+
+def save(profile, fixtures):
+    directory = FIXTURES_DIR / profile
+    directory.mkdir(parents=True, exist_ok=True)
+    for path, filename in ENDPOINTS.items():
+        with open(directory / filename, "w", encoding="utf-8") as f:
+            json.dump(fixtures[path], f, ensure_ascii=False)
+    return directory
+
+
+def record(api_key, steam_id, app_id=APP_ID):
+    """実際のSteam APIからフィクスチャ用のレスポンスを取得する"""
+    params = {
+        "ISteamUserStats/GetUserStatsForGame/v0002/": {"appid": app_id, "key": api_key, "steamid": steam_id},
+        "IPlayerService/GetOwnedGames/v0001/": {"key": api_key, "steamid": steam_id, "format": "json"},
+        SCHEMA_PATH: {"key": api_key, "appid": app_id},
+    }
+    fixtures = {}
+    for path in ENDPOINTS:
+        response = steam_client.get(path, params=params[path])
+        response.raise_for_status()
+        fixtures[path] = response.json()
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="合成フィクスチャを書き出す")
+    generate_parser.add_argument("profiles", nargs="*", default=list(PROFILES), choices=list(PROFILES))
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    record_parser = subparsers.add_parser("record", help="実際のレスポンスをフィクスチャとして保存する")
+    record_parser.add_argument("profile")
+    record_parser.add_argument("steam_id")
+    record_parser.add_argument("--api-key", default=os.environ.get("STEAM_API_KEY"), help="Steam APIキー（既定: 環境変数 STEAM_API_KEY）")
+    record_parser.add_argument("--app-id", type=int, default=APP_ID)
+
+    args = parser.parse_args()
+    if args.command == "generate":
+        for profile in args.profiles:
+            print(f"{profile}: {save(profile, generate(profile, args.seed))}")
+    else:
+        if not args.api_key:
+            parser.error("--api-key または環境変数 STEAM_API_KEY が必要です")
+        print(f"{args.profile}: {save(args.profile, record(args.api_key, args.steam_id, args.app_id))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""response.json() と逐次デコード（kf2core.jsonstream）のピークメモリ（RSS）と所要時間を比較する
+
+使い方:
+    $ python benchmarks/json_stream.py [--profiles typical huge] [--scale 20] [--runs 3]
+
+フィクスチャの統計と所有ゲームを --scale 倍に増やしてスタブサーバーから返し、
+GetUserStatsForGame（統計の辞書を作るまで）と GetOwnedGames（フィルタなしの全件から
+KF2のプレイ時間を探すまで）を、それぞれ別プロセスで1回だけ実行する。
+ピークRSSは読み込み前後の VmHWM（なければ ru_maxrss）の差（モジュールの読み込み分は含めない）。
+"""
+
+import argparse
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fixtures as fixture_store
+from stub_server import StubSteamServer
+
+from kf2core.steam_api import (
+    OWNED_GAMES_PATH, USER_STATS_PATH, fetch_player_snapshot, owned_games_params, read_stream, stream_owned_game_playtime,
+)
+from kf2core.steam_client import SteamClient
+
+API_KEY = "BENCHMARK"
+APP_ID = fixture_store.APP_ID
+STEAM_ID = fixture_store.STEAM_ID
+
+
+def stats_from_json(client):
+    """以前の実装と同じく、本文全体を response.json() で読み込んでから統計の辞書を作る"""
+    response = client.get(USER_STATS_PATH, params={"appid": APP_ID, "key": API_KEY, "steamid": STEAM_ID})
+    response.raise_for_status()
+    return {s["name"]: s["value"] for s in response.json()["playerstats"]["stats"]}
+
+
+def playtime_from_json(client):
+    """以前の実装と同じく、所有ゲーム一覧全体を読み込んでから探す"""
+    response = client.get(OWNED_GAMES_PATH, params=owned_games_params(API_KEY, STEAM_ID))
+    response.raise_for_status()
+    for game in response.json().get("response", {}).get("games") or []:
+        if game["appid"] == APP_ID:
+            return game.get("playtime_forever", 0)
+    return 0
+
+
+def playtime_from_stream(client):
+    with client.get(OWNED_GAMES_PATH, params=owned_games_params(API_KEY, STEAM_ID), stream=True) as response:
+        return read_stream(response, stream_owned_game_playtime, APP_ID)
+
+
+# (エンドポイント, 方式) → 計測する処理
+VARIANTS = {
+    ("GetUserStatsForGame", "json"): stats_from_json,
+    ("GetUserStatsForGame", "stream"): lambda client: fetch_player_snapshot(API_KEY, STEAM_ID, APP_ID, client=client).stats,
+    ("GetOwnedGames", "json"): playtime_from_json,
+    ("GetOwnedGames", "stream"): playtime_from_stream,
+}
+
+
+def max_rss_kib():
+    """このプロセスのピークRSS（KiB）"""
+    # Linux の ru_maxrss は exec 前の親プロセスのピークを引き継ぐため、VmHWM を優先する
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux はKiB
+    return usage / 1024 if sys.platform == "darwin" else usage
+
+
+def run_child(endpoint, method, base_url):
+    """子プロセスとして1回だけ実行し、結果をJSONで標準出力に書く"""
+    client = SteamClient(base_url=base_url)
+    before = max_rss_kib()
+    start = time.perf_counter()
+    result = VARIANTS[(endpoint, method)](client)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(json.dumps({"peak_kib": max_rss_kib() - before, "ms": elapsed, "size": len(result) if isinstance(result, dict) else result}))
+
+
+def scaled_fixtures(profile, scale):
+    """フィクスチャの統計と所有ゲームを scale 倍に増やす（KF2の位置は同じ割合の位置に置く）"""
+    fixtures = fixture_store.load(profile)
+    rng = random.Random(f"{profile}-{scale}")
+
+    player_stats = fixtures[USER_STATS_PATH]["playerstats"]
+    stats = player_stats["stats"]
+    player_stats["stats"] = stats + [
+        {"name": f"1_{100_000 + i}", "value": rng.randrange(0, 1_000_000)} for i in range(len(stats) * (scale - 1))
+    ]
+
+    games = fixtures[OWNED_GAMES_PATH]["response"]["games"]
+    position = next(i for i, game in enumerate(games) if game["appid"] == APP_ID) / len(games)
+    target = games.pop(next(i for i, game in enumerate(games) if game["appid"] == APP_ID))
+    template = games[0] if games else {"appid": 0, "playtime_forever": 0}
+    games = [{**template, "appid": 2_000_000 + i, "playtime_forever": rng.randrange(0, 50_000)} for i in range((len(games) + 1) * scale - 1)]
+    games.insert(int(len(games) * position), target)
+    fixtures[OWNED_GAMES_PATH] = {"response": {"game_count": len(games), "games": games}}
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["typical", "huge"], choices=list(fixture_store.PROFILES))
+    parser.add_argument("--scale", type=int, default=20, help="統計数と所有ゲーム数を何倍にするか")
+    parser.add_argument("--runs", type=int, default=3, help="方式ごとに子プロセスを起動する回数（中央値を表示する）")
+    parser.add_argument("--child", nargs=3, metavar=("ENDPOINT", "METHOD", "BASE_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    for profile in args.profiles:
+        fixtures = scaled_fixtures(profile, args.scale)
+        sizes = {
+            "GetUserStatsForGame": len(json.dumps(fixtures[USER_STATS_PATH]).encode("utf-8")),
+            "GetOwnedGames": len(json.dumps(fixtures[OWNED_GAMES_PATH]).encode("utf-8")),
+        }
+        print(f"\n[{profile} x{args.scale}]")
+        print(f"  {'エンドポイント':<20} {'本文 KiB':>10} {'方式':>7} {'ピークRSS KiB':>14} {'ms':>8}")
+        with StubSteamServer(fixtures) as server:
+            for (endpoint, method) in VARIANTS:
+                results = []
+                for _ in range(args.runs):
+                    output = subprocess.run(
+                        [sys.executable, __file__, "--child", endpoint, method, server.base_url],
+                        capture_output=True, text=True, check=True,
+                    ).stdout
+                    results.append(json.loads(output))
+                peak = statistics.median(result["peak_kib"] for result in results)
+                elapsed = statistics.median(result["ms"] for result in results)
+                print(f"  {endpoint:<20} {sizes[endpoint] / 1024:>10,.0f} {method:>7} {peak:>14,.0f} {elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""GetOwnedGames の全件取得と appids_filter 付き取得のレスポンスサイズ・レイテンシを比較する
+
+使い方:
+    $ STEAM_API_KEY=<APIキー> python benchmarks/owned_games_payload.py <SteamID64> [--runs 5]
+    $ python benchmarks/owned_games_payload.py --stub huge [--latency-ms 20]   # ローカルのスタブサーバー
+
+--stub ではフィクスチャ（benchmarks/fixtures.py）を返すスタブサーバー（benchmarks/stub_server.py）に
+問い合わせるので、APIキーは不要。スタブも appids_filter を実際のAPIと同じように扱う。
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fixtures as fixture_store
+from stub_server import StubSteamServer
+
+from kf2core.steam_client import SteamClient, steam_client
+
+OWNED_GAMES_PATH = "IPlayerService/GetOwnedGames/v0001/"
+
+
+def measure(client, params, runs):
+    """同じリクエストを runs 回送り、(レスポンスバイト数, レイテンシ[ms]のリスト) を返す"""
+    latencies = []
+    size = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.get(OWNED_GAMES_PATH, params=params)
+        response.raise_for_status()
+        size = len(response.content)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return size, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("steam_id", nargs="?", help="64ビットSteam ID（--stub では省略可）")
+    parser.add_argument("--app-id", type=int, default=232090)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--stub", choices=list(fixture_store.PROFILES), help="実際のAPIの代わりにこのフィクスチャのスタブサーバーに問い合わせる")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="スタブサーバーの1リクエストあたりの遅延")
+    args = parser.parse_args()
+
+    if args.stub:
+        api_key = "stub"
+        steam_id = args.steam_id or fixture_store.STEAM_ID
+    else:
+        api_key = os.environ.get("STEAM_API_KEY")
+        if not api_key:
+            parser.error("環境変数 STEAM_API_KEY を設定してください（APIキーなしで試す場合は --stub）")
+        if not args.steam_id:
+            parser.error("Steam ID を指定してください")
+        steam_id = args.steam_id
+
+    base_params = {"key": api_key, "steamid": steam_id, "format": "json"}
+    variants = {
+        "全件": base_params,
+        "appids_filter": {**base_params, "appids_filter[0]": args.app_id},
+    }
+
+    with contextlib.ExitStack() as stack:
+        client = steam_client
+        if args.stub:
+            server = stack.enter_context(StubSteamServer(fixture_store.load(args.stub), latency=args.latency_ms / 1000))
+            client = SteamClient(base_url=server.base_url)
+            print(f"スタブサーバー（{args.stub}、遅延 {args.latency_ms:g} ms）に問い合わせます")
+        results = {name: measure(client, params, args.runs) for name, params in variants.items()}
+    for name, (size, latencies) in results.items():
+        print(f"{name:>14}: {size:>10,} bytes  中央値 {statistics.median(latencies):7.1f} ms  最大 {max(latencies):7.1f} ms")
+
+    full_size, full_latencies = results["全件"]
+    filtered_size, filtered_latencies = results["appids_filter"]
+    if full_size:
+        print(f"{'削減率':>14}: {1 - filtered_size / full_size:.1%} (サイズ)  "
+              f"{1 - statistics.median(filtered_latencies) / statistics.median(full_latencies):.1%} (レイテンシ)")
+
+
+if __name__ == "__main__":
+    main()
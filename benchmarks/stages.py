@@ -0,0 +1,270 @@
+"""取得・解析・分析・描画の各段階の所要時間とピークメモリを計測する
+
+使い方:
+    $ python benchmarks/stages.py [--profiles small typical huge] [--runs 20] [--app simple.py]
+    $ python benchmarks/stages.py --compare benchmarks/results/<前回>.json
+
+フィクスチャ（benchmarks/fixtures.py）をローカルのスタブサーバー（benchmarks/stub_server.py）
+から返し、段階ごとに p50 / p95 の所要時間と tracemalloc によるピークメモリを表示する。
+結果は benchmarks/results/ に JSON で保存され、--compare で前回の結果と比較できる。
+
+段階:
+    fetch.*    スタブサーバーへのHTTP呼び出しとJSONの読み込み（kf2core.steam_api / schema）
+               fetch.player_snapshot は本文を逐次読みながら統計の辞書まで作る（kf2core.jsonstream）
+    parse.*    通信を除いた読み込み。parse.stats_stream はアプリと同じ逐次読み取り
+               （stream_player_stats）で、受信済みの本文から統計の辞書と実績を作る
+    analyze    analyze_kf2_stats
+    render.*   アプリの display_* 関数（Streamlitのランタイムなしで実行。実績アイコンはキャッシュ済みの状態）
+    app        AppTest でアプリ全体を1回実行（ボタン押下から描画まで）
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 計測中の履歴・スキーマキャッシュを普段のキャッシュと混ぜない
+os.environ["KF2_CACHE_DIR"] = tempfile.mkdtemp(prefix="kf2-bench-")
+sys.path.insert(0, str(ROOT))
+
+import fixtures as fixture_store
+from stub_server import StubSteamServer
+from streamlit import config as streamlit_config
+from streamlit.logger import set_log_level
+
+from kf2core.analysis import analyze_kf2_stats
+from kf2core.cache import clear_all
+from kf2core.icons import icon_cache, schema_icon_urls
+from kf2core.jsonstream import CHUNK_SIZE, JSONStream
+from kf2core.schema import SCHEMA_PATH, SchemaCache, fetch_game_schema, parse_game_schema, schema_cache
+from kf2core.steam_api import USER_STATS_PATH, fetch_player_playtime, fetch_player_snapshot, stream_player_stats
+from kf2core.steam_client import SteamClient, steam_client
+
+API_KEY = "BENCHMARK"
+
+
+def percentile(values, q):
+    """線形補間のパーセンタイル（q は 0〜1）"""
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def measure(func, runs):
+    """func を runs 回実行した所要時間と、別に1回実行したときのピークメモリを返す"""
+    func()  # ウォームアップ
+    elapsed = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": percentile(elapsed, 0.5),
+        "p95_ms": percentile(elapsed, 0.95),
+        "peak_kib": peak / 1024,
+    }
+
+
+def load_app(script):
+    """Streamlitアプリから import・定数・関数定義だけを実行し、名前空間を返す（メイン処理は実行しない）"""
+    tree = ast.parse(Path(script).read_text(encoding="utf-8"))
+    body = [
+        node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef))
+        or (isinstance(node, ast.Assign) and not isinstance(node.value, ast.Call))
+    ]
+    namespace = {"__name__": "kf2_benchmark_app", "__file__": str(script)}
+    exec(compile(ast.Module(body=body, type_ignores=[]), str(script), "exec"), namespace)
+    return namespace
+
+
+def render_stages(app, data):
+    """アプリに存在する display_* 関数ごとの計測対象を返す"""
+    calls = {
+        "display_overview_dashboard": lambda f: f(data["analysis"], data["playtime"]),
+        "display_perk_overview": lambda f: f(data["analysis"]),
+        "display_kill_statistics": lambda f: f(data["analysis"]),
+        "display_personal_bests": lambda f: f(data["analysis"]),
+        "display_achievement_progress": lambda f: f(
+            data["analysis"], data["achievements"],
+            data["schema"].total_achievements, data["schema"].achievements,
+        ),
+        "display_special_stats": lambda f: f(data["analysis"]),
+        "display_debug_info": lambda f: f(data["stats_dict"], data["schema"].stats),
+    }
+    return {
+        f"render.{name.removeprefix('display_')}": (lambda call=call, func=app[name]: call(func))
+        for name, call in calls.items() if name in app
+    }
+
+
+def run_app_once(script, steam_id):
+    """キャッシュを空にしてから、アプリ全体をボタン押下から1回実行する"""
+    from streamlit.testing.v1 import AppTest
+
+    clear_all()
+    schema_cache.purge()
+    at = AppTest.from_file(str(script), default_timeout=120).run()
+    at.sidebar.text_input[0].set_value(API_KEY)
+    at.sidebar.text_input[1].set_value(steam_id)
+    next(button for button in at.sidebar.button if "戦績" in button.label).click()
+    return at
+
+
+def bench_profile(profile, script, app, runs, app_runs, latency):
+    fixtures = fixture_store.load(profile)
+    steam_id = fixtures["ISteamUserStats/GetUserStatsForGame/v0002/"]["playerstats"].get("steamID", fixture_store.STEAM_ID)
+    app_id = fixture_store.APP_ID
+    results = {}
+
+    with StubSteamServer(fixtures, latency=latency) as server, tempfile.TemporaryDirectory() as cache_dir:
+        client = SteamClient(base_url=server.base_url)
+        bench_cache = SchemaCache(cache_dir)
+
+        snapshot = fetch_player_snapshot(API_KEY, steam_id, app_id, client=client)
+        stats_dict = snapshot.stats
+        # アイコンのURLがスタブサーバーを指すスキーマを使い、描画の計測前にアイコンをキャッシュしておく
+        schema = fetch_game_schema(API_KEY, app_id, cache=bench_cache, client=client)
+        icon_cache.ensure(schema_icon_urls(schema))
+        analysis = analyze_kf2_stats(stats_dict)
+        # 受信済みの本文を、レスポンスと同じ大きさのチャンクに分けて逐次読み取りに渡す
+        stats_body = json.dumps(fixtures[USER_STATS_PATH], ensure_ascii=False).encode("utf-8")
+        stats_chunks = [stats_body[i:i + CHUNK_SIZE] for i in range(0, len(stats_body), CHUNK_SIZE)]
+        data = {
+            "achievements": snapshot.achievements,
+            "stats_dict": stats_dict,
+            "schema": schema,
+            "analysis": analysis,
+            "playtime": fetch_player_playtime(API_KEY, steam_id, app_id, client=client),
+        }
+
+        stages = {
+            "fetch.player_snapshot": lambda: fetch_player_snapshot(API_KEY, steam_id, app_id, client=client),
+            "fetch.playtime": lambda: fetch_player_playtime(API_KEY, steam_id, app_id, client=client),
+            "fetch.schema": lambda: (bench_cache.purge(), fetch_game_schema(API_KEY, app_id, cache=bench_cache, client=client)),
+            "parse.stats_stream": lambda: stream_player_stats(JSONStream(stats_chunks)),
+            "parse.schema": lambda: parse_game_schema(fixtures[SCHEMA_PATH]),
+            "analyze": lambda: analyze_kf2_stats(stats_dict),
+            **render_stages(app, data),
+        }
+        for name, func in stages.items():
+            results[name] = measure(func, runs)
+
+        if app_runs:
+            steam_client.base_url = server.base_url
+            elapsed = []
+            for _ in range(app_runs):
+                at = run_app_once(script, steam_id)
+                start = time.perf_counter()
+                at.run()
+                elapsed.append((time.perf_counter() - start) * 1000)
+                if at.exception:
+                    raise RuntimeError(f"{profile}: アプリの実行中に例外が発生しました: {at.exception[0].value}")
+            results["app"] = {
+                "p50_ms": percentile(elapsed, 0.5),
+                "p95_ms": percentile(elapsed, 0.95),
+                "peak_kib": None,
+            }
+
+        results["_payload_bytes"] = {
+            path: len(json.dumps(payload, ensure_ascii=False).encode("utf-8")) for path, payload in fixtures.items()
+        }
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, previous=None):
+    for profile, stages in results.items():
+        print(f"\n[{profile}]")
+        print(f"  {'段階':<28} {'p50 ms':>10} {'p95 ms':>10} {'peak KiB':>10}" + (f" {'前回p50比':>10}" if previous else ""))
+        for name, result in stages.items():
+            if name.startswith("_"):
+                continue
+            peak = f"{result['peak_kib']:10.1f}" if result["peak_kib"] is not None else f"{'-':>10}"
+            line = f"  {name:<28} {result['p50_ms']:10.2f} {result['p95_ms']:10.2f} {peak}"
+            before = (previous or {}).get(profile, {}).get(name)
+            if before:
+                line += f" {result['p50_ms'] / before['p50_ms']:9.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=list(fixture_store.PROFILES), choices=list(fixture_store.PROFILES))
+    parser.add_argument("--runs", type=int, default=20, help="各段階の計測回数")
+    parser.add_argument("--app", default=str(ROOT / "simple.py"), help="描画を計測するアプリ（simple.py / colorful.py）")
+    parser.add_argument("--app-runs", type=int, default=3, help="アプリ全体の実行回数（0 で省略）")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="スタブサーバーの1リクエストあたりの遅延")
+    parser.add_argument("--output", help="結果の保存先（既定: benchmarks/results/<日時>-<リビジョン>.json）")
+    parser.add_argument("--compare", help="比較する前回の結果ファイル")
+    args = parser.parse_args()
+
+    # Streamlitのランタイムなしで st.* を呼ぶと出る警告や非推奨の警告を抑える
+    # （設定ファイルの読み込み時にログレベルが戻るため、先に読み込ませてから変更する）
+    streamlit_config.get_option("logger.level")
+    set_log_level("error")
+
+    script = Path(args.app).resolve()
+    app = load_app(script)
+    revision = git_revision()
+    results = {
+        profile: bench_profile(profile, script, app, args.runs, args.app_runs, args.latency_ms / 1000)
+        for profile in args.profiles
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+    print_results(results, previous)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "revision": revision,
+                "app": script.name,
+                "runs": args.runs,
+                "app_runs": args.app_runs,
+                "latency_ms": args.latency_ms,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+            },
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""フィクスチャを返すローカルのSteam APIスタブサーバー
+
+使い方:
+    $ python benchmarks/stub_server.py typical --port 8089
+    $ KF2_STEAM_API_BASE_URL=http://127.0.0.1:8089/ streamlit run simple.py
+
+ベンチマークからは StubSteamServer をコンテキストマネージャーとして使う。
+GetOwnedGames の appids_filter と、スキーマの ETag による 304 応答を実際のAPIと同じように扱う。
+スキーマの実績アイコンのURLはこのサーバーの icons/ を指すように書き換え、生成した画像を返す。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fixtures as fixture_store
+from PIL import Image
+
+from kf2core.schema import SCHEMA_PATH
+
+OWNED_GAMES_PATH = "IPlayerService/GetOwnedGames/v0001/"
+ICONS_PATH = "icons/"
+ICON_SIZE = 64
+
+
+def _encode(payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return body, '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _icon(name):
+    """ファイル名から決まる色の実績アイコン（JPEG）を作る"""
+    red, green, blue = hashlib.sha1(name.encode("utf-8")).digest()[:3]
+    if name.endswith("_gray.jpg"):
+        red = green = blue = (red + green + blue) // 3
+    output = io.BytesIO()
+    Image.new("RGB", (ICON_SIZE, ICON_SIZE), (red, green, blue)).save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def _with_local_icons(schema, base_url):
+    """スキーマの実績アイコンのURLを base_url/icons/<ファイル名> に置き換えたコピーを返す"""
+    game = schema.get("game", {})
+    stats = game.get("availableGameStats", {})
+    achievements = [
+        {**ach, **{field: base_url + ICONS_PATH + ach[field].rsplit("/", 1)[-1] for field in ("icon", "icongray") if ach.get(field)}}
+        for ach in stats.get("achievements", [])
+    ]
+    return {**schema, "game": {**game, "availableGameStats": {**stats, "achievements": achievements}}}
+
+
+class StubSteamServer:
+    """フィクスチャを {パス: レスポンス} で受け取り、別スレッドでHTTPサーバーを動かす"""
+
+    def __init__(self, fixtures, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency  # 1リクエストごとに足す遅延（秒）
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        if SCHEMA_PATH in fixtures:
+            fixtures = {**fixtures, SCHEMA_PATH: _with_local_icons(fixtures[SCHEMA_PATH], self.base_url)}
+        self._responses = {path: _encode(payload) for path, payload in fixtures.items()}
+        self._owned_games = fixtures.get(OWNED_GAMES_PATH)
+        self._icons = {}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文を別々に書くため、Nagle + 遅延ACKで40ms待たされないようにする
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # 逐次デコードは目的の値を読んだ時点で接続を閉じる
+                    pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                path = url.path.lstrip("/")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if path.startswith(ICONS_PATH):
+                    self._send(200, stub._icon(path[len(ICONS_PATH):]), content_type="image/jpeg")
+                    return
+                if path not in stub._responses:
+                    self._send(404, b"")
+                    return
+                body, etag = stub._owned_games_response(parse_qs(url.query)) if path == OWNED_GAMES_PATH else stub._responses[path]
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, b"", etag)
+                else:
+                    self._send(200, body, etag)
+
+            def _send(self, status, body, etag=None, content_type="application/json; charset=utf-8"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _icon(self, name):
+        with self._lock:
+            if name not in self._icons:
+                self._icons[name] = _icon(name)
+            return self._icons[name]
+
+    def _owned_games_response(self, query):
+        """appids_filter[i] が指定されていれば、そのゲームだけに絞ったレスポンスを返す"""
+        app_ids = {int(values[0]) for key, values in query.items() if key.startswith("appids_filter[")}
+        if not app_ids:
+            return self._responses[OWNED_GAMES_PATH]
+        games = [game for game in self._owned_games["response"].get("games", []) if game["appid"] in app_ids]
+        return _encode({"response": {"game_count": len(games), "games": games}})
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-steam-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """現在のスレッドでサーバーを動かす（Ctrl+C で停止）"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("profile", choices=list(fixture_store.PROFILES))
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubSteamServer(fixture_store.load(args.profile), latency=args.latency_ms / 1000, port=args.port)
+    print(f"{args.profile} を {server.base_url} で返します（Ctrl+C で停止）")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
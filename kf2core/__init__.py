@@ -0,0 +1 @@
+"""KF2 Stats Viewer の共通処理（simple.py / colorful.py から利用する）"""
@@ -0,0 +1,79 @@
+"""戦績データの分析（Perkレベル計算と analyze_kf2_stats）"""
+
+from .constants import (
+    ACHIEVEMENT_IDS,
+    KILL_STAT_IDS,
+    MAX_PERK_LEVEL,
+    PERK_STAT_IDS,
+    PERSONAL_BEST_IDS,
+    SPECIAL_STAT_IDS,
+)
+from .metrics import metrics
+from .perk_level import calculate_perk_level_info
+from .stat_index import StatIndex
+
+# analyze_kf2_stats で参照する統計IDを1つの配列にまとめた抽出用インデックス
+STAT_INDEX = StatIndex({
+    "perk_progress": {perk_name: ids["progress"] for perk_name, ids in PERK_STAT_IDS.items()},
+    "perk_build": {perk_name: ids["build"] for perk_name, ids in PERK_STAT_IDS.items()},
+    "perk_weld": {perk_name: ids["weld"] for perk_name, ids in PERK_STAT_IDS.items() if "weld" in ids},
+    "perk_heal": {perk_name: ids["heal"] for perk_name, ids in PERK_STAT_IDS.items() if "heal" in ids},
+    "kills": KILL_STAT_IDS,
+    "personal_bests": PERSONAL_BEST_IDS,
+    "achievements": ACHIEVEMENT_IDS,
+    "special_stats": SPECIAL_STAT_IDS,
+})
+
+
+def get_stat_value(stats_dict, stat_id):
+    """統計IDから値を取得する"""
+    return stats_dict.get(f"1_{stat_id}", 0)
+
+
+@metrics.timed("analyze.stats")
+def analyze_kf2_stats(stats_dict):
+    """KF2統計データを詳細に分析する"""
+    # 参照する統計をインデックスの列順に1回でまとめて取り出す
+    return analyze_stat_values(STAT_INDEX.extract(STAT_INDEX.row(stats_dict)))
+
+
+def analyze_stat_values(values):
+    """StatIndex で抽出したカテゴリ別の統計値から分析結果を組み立てる"""
+    analysis = {}
+
+    # Perkデータの分析
+    perks = {}
+    for perk_name, ids in PERK_STAT_IDS.items():
+        progress_xp = values["perk_progress"][perk_name]
+        build_xp = values["perk_build"][perk_name]
+
+        if progress_xp > 0 or build_xp > 0:
+            # 進捗XPが主要な値のようだ
+            total_xp = progress_xp if progress_xp > 0 else build_xp
+            level, progress_percent, next_level_xp = calculate_perk_level_info(total_xp)
+
+            perks[perk_name] = {
+                "level": level,
+                "xp": total_xp,
+                "progress_percent": progress_percent,
+                "next_level_xp": next_level_xp,
+                "is_max": level >= MAX_PERK_LEVEL
+            }
+
+            # 特別な統計
+            if perk_name == "Support" and "weld" in ids:
+                perks[perk_name]["weld_points"] = values["perk_weld"][perk_name]
+            elif perk_name == "Field Medic" and "heal" in ids:
+                perks[perk_name]["heal_points"] = values["perk_heal"][perk_name]
+
+    analysis["perks"] = perks
+
+    # キル統計・パーソナルベスト・実績進捗（統計データベース）
+    analysis["kills"] = values["kills"]
+    analysis["personal_bests"] = values["personal_bests"]
+    analysis["achievements"] = values["achievements"]
+
+    # 特別な統計
+    analysis["special_stats"] = values["special_stats"]
+
+    return analysis
@@ -0,0 +1,97 @@
+"""多数のプレイヤー・スナップショットをまとめて分析する列指向の分析エンジン
+
+analyze_kf2_stats と同じ結果を、1行1スナップショットの DataFrame として返す。
+列名は analyze_kf2_stats の入れ子の辞書のパスをドットでつないだもの
+（例: analysis["perks"]["Commando"]["level"] → "perks.Commando.level"）。
+Perkレベルの計算も含めてすべて配列演算で行うため、件数が多いほど1件ずつ
+analyze_kf2_stats を呼ぶより速い（数百件未満では DataFrame を作る分だけ遅い）。
+ランキング（kf2core.leaderboard）の初回の読み込みなど、多数のプレイヤーをまとめて読み直す時に使う。
+"""
+
+import numpy as np
+import pandas as pd
+
+from .analysis import STAT_INDEX
+from .constants import MAX_PERK_LEVEL, PERK_STAT_IDS
+from .perk_level import calculate_perk_level_arrays
+
+# 値をそのまま列にするカテゴリ
+_VALUE_CATEGORIES = ("kills", "personal_bests", "achievements", "special_stats")
+
+
+def stat_matrix(data):
+    """入力を STAT_INDEX の列順の (件数 × 参照統計) 配列と行ラベルに変換する
+
+    data は次のいずれか:
+    - 列が統計名（"1_<ID>"）の DataFrame（存在しない列は 0）
+    - STAT_INDEX.matrix() で作った2次元配列
+    - stats_dict または playerstats["stats"] のリスト
+    """
+    if isinstance(data, pd.DataFrame):
+        columns = data.reindex(columns=STAT_INDEX.names, fill_value=0)
+        return columns.fillna(0).to_numpy(dtype=np.int64), data.index
+    if isinstance(data, np.ndarray):
+        return data, pd.RangeIndex(len(data))
+    return STAT_INDEX.matrix(list(data)), pd.RangeIndex(len(data))
+
+
+def analyze_frame(data):
+    """多数のスナップショットを一括分析し、1行1スナップショットの DataFrame を返す"""
+    matrix, index = stat_matrix(data)
+    extracted = STAT_INDEX.extract_matrix(matrix)
+    columns = {}
+
+    progress_labels, progress_xp = extracted["perk_progress"]
+    _, build_xp = extracted["perk_build"]
+    total_xp = np.where(progress_xp > 0, progress_xp, build_xp)
+    level, progress_percent, next_level_xp = calculate_perk_level_arrays(total_xp)
+    active = (progress_xp > 0) | (build_xp > 0)
+    for i, perk_name in enumerate(progress_labels):
+        prefix = f"perks.{perk_name}."
+        columns[prefix + "level"] = level[:, i]
+        columns[prefix + "xp"] = total_xp[:, i]
+        columns[prefix + "progress_percent"] = progress_percent[:, i]
+        columns[prefix + "next_level_xp"] = next_level_xp[:, i]
+        columns[prefix + "is_max"] = level[:, i] >= MAX_PERK_LEVEL
+        columns[prefix + "active"] = active[:, i]
+
+    for category, field in (("perk_weld", "weld_points"), ("perk_heal", "heal_points")):
+        labels, values = extracted[category]
+        for i, perk_name in enumerate(labels):
+            columns[f"perks.{perk_name}.{field}"] = values[:, i]
+
+    for category in _VALUE_CATEGORIES:
+        labels, values = extracted[category]
+        for i, label in enumerate(labels):
+            columns[f"{category}.{label}"] = values[:, i]
+
+    return pd.DataFrame(columns, index=index)
+
+
+def to_analysis(row):
+    """analyze_frame の1行を analyze_kf2_stats と同じ入れ子の辞書に戻す"""
+    values = row.to_dict()
+    analysis = {"perks": {}}
+    for perk_name, ids in PERK_STAT_IDS.items():
+        prefix = f"perks.{perk_name}."
+        if not values[prefix + "active"]:
+            continue
+        perk = {
+            "level": int(values[prefix + "level"]),
+            "xp": int(values[prefix + "xp"]),
+            "progress_percent": float(values[prefix + "progress_percent"]),
+            "next_level_xp": int(values[prefix + "next_level_xp"]),
+            "is_max": bool(values[prefix + "is_max"]),
+        }
+        if "weld" in ids:
+            perk["weld_points"] = int(values[prefix + "weld_points"])
+        elif "heal" in ids:
+            perk["heal_points"] = int(values[prefix + "heal_points"])
+        analysis["perks"][perk_name] = perk
+    for category in _VALUE_CATEGORIES:
+        prefix = f"{category}."
+        analysis[category] = {
+            name[len(prefix):]: int(value) for name, value in values.items() if name.startswith(prefix)
+        }
+    return analysis
+
@@ -0,0 +1,119 @@
+"""プロセス内で共有するTTL付きLRUキャッシュ（st.cache_data 相当）
+
+Streamlitはウィジェット操作のたびにスクリプトを再実行するため、スクリプト内で
+作ったキャッシュは毎回作り直される。ここではキャッシュを名前で登録しておき、
+再実行後のデコレートでも同じストアを使い回す。
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# プレイヤー単位の取得結果を保持する秒数と最大件数（環境変数で変更可能）
+PLAYER_CACHE_TTL_SECONDS = float(os.environ.get("KF2_PLAYER_CACHE_TTL", 120))
+PLAYER_CACHE_MAXSIZE = int(os.environ.get("KF2_PLAYER_CACHE_MAXSIZE", 256))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """有効期限と最大件数を持つスレッドセーフなLRUキャッシュ"""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key → (保存時刻, 値)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or time.monotonic() - item[0] >= self.ttl:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(name, ttl=PLAYER_CACHE_TTL_SECONDS, maxsize=PLAYER_CACHE_MAXSIZE):
+    """名前付きキャッシュを返す（なければ作成する）"""
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            cache = _registry[name] = TTLCache(ttl, maxsize)
+        else:
+            cache.ttl = ttl
+            cache.maxsize = maxsize
+        return cache
+
+
+def clear_all():
+    """登録済みのすべてのキャッシュを空にする"""
+    with _registry_lock:
+        caches = list(_registry.values())
+    for cache in caches:
+        cache.clear()
+
+
+def cache_stats():
+    """登録済みキャッシュごとのヒット数・ミス数・件数を返す"""
+    with _registry_lock:
+        caches = dict(_registry)
+    return {name: {"hits": cache.hits, "misses": cache.misses, "size": len(cache)} for name, cache in caches.items()}
+
+
+def memoize(name, key, ttl=PLAYER_CACHE_TTL_SECONDS, maxsize=PLAYER_CACHE_MAXSIZE, cache_if=lambda value: True):
+    """関数の戻り値を名前付きキャッシュに保存するデコレーター
+
+    key は関数と同じ引数を受け取りキャッシュキーを返す関数。cache_if が False を返す値
+    （エラー時の既定値など）は保存しない。呼び出し時に force_refresh=True を渡すと
+    キャッシュを無視して再取得し、結果で上書きする。
+    """
+    def decorator(func):
+        cache = get_cache(name, ttl, maxsize)
+
+        @functools.wraps(func)
+        def wrapper(*args, force_refresh=False, **kwargs):
+            cache_key = key(*args, **kwargs)
+            if not force_refresh:
+                value = cache.get(cache_key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            value = func(*args, **kwargs)
+            if cache_if(value):
+                cache.set(cache_key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
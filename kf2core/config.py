@@ -0,0 +1,7 @@
+"""共通の設定値"""
+
+import os
+from pathlib import Path
+
+# キャッシュ・履歴の保存先（環境変数 KF2_CACHE_DIR で変更可能）
+DEFAULT_CACHE_DIR = Path(os.environ.get("KF2_CACHE_DIR", Path.home() / ".cache" / "kf2-status-viewer"))
@@ -0,0 +1,86 @@
+"""KF2の統計ID・経験値テーブルなどの定数"""
+
+# ゲーム名とSteam AppIDの対応表
+GAME_APP_IDS = {
+    "Killing Floor 2": 232090,
+}
+
+# Perkのレベルアップに必要な累計経験値のテーブル
+CUMULATIVE_XP_PER_LEVEL = [
+    0, 2640, 5557, 8781, 12343, 16279, 20628, 25434, 30745, 36613,
+    43097, 50262, 58180, 66929, 76596, 87279, 99083, 112127, 126540,
+    142467, 160066, 179513, 201002, 224747, 250985, 279978
+]
+
+# 最大レベルと必要ポイント
+MAX_PERK_LEVEL = 25
+# ゲーム内のプレステージの上限（参考値）。GetUserStatsForGame の統計にはプレステージの段階がなく、
+# 経験値の統計からも求められないため、このツールでは使わない（kf2core.perk_level を参照）
+MAX_PRESTIGE_LEVEL = 2
+WELDING_POINTS_REQUIRED = 510
+HEALING_POINTS_REQUIRED = 10
+KFMAX_PERKS = 10
+
+# KF2のPerk統計ID（APIデータより）
+PERK_STAT_IDS = {
+    "Commando": {"progress": 1, "build": 2},
+    "Berserker": {"progress": 10, "build": 11},
+    "Support": {"progress": 20, "build": 21, "weld": 22},
+    "Firebug": {"progress": 30, "build": 31},
+    "Field Medic": {"progress": 40, "build": 41, "heal": 42},
+    "Sharpshooter": {"progress": 50, "build": 51},
+    "Demolitionist": {"progress": 60, "build": 61},
+    "Survivalist": {"progress": 70, "build": 71},
+    "Gunslinger": {"progress": 80, "build": 81},
+    "SWAT": {"progress": 90, "build": 91},
+}
+
+# 各種統計マッピング
+KILL_STAT_IDS = {
+    "総キル数": 200,
+    "ストーカー討伐": 201,
+    "クローラー討伐": 202,
+    "フレッシュパウンド討伐": 203,
+}
+
+PERSONAL_BEST_IDS = {
+    "ナイフキル": 2000,
+    "ピストルキル": 2001,
+    "ヘッドショット": 2002,
+    "ヒール量": 2003,
+    "総キル": 2004,
+    "アシスト": 2005,
+    "大型ZED討伐": 2006,
+    "DOSH獲得": 2007,
+}
+
+ACHIEVEMENT_IDS = {
+    "MrPerky5": 4001,
+    "MrPerky10": 4002,
+    "MrPerky15": 4003,
+    "MrPerky20": 4004,
+    "MrPerky25": 4005,
+    "Hard勝利": 4015,
+    "Suicidal勝利": 4016,
+    "Hell勝利": 4017,
+    "VSZed勝利": 4009,
+    "VSHuman勝利": 4010,
+    "HoldOut": 4011,
+    "DieVolter": 4012,
+    "FleshPound討伐": 4013,
+    "Shrike討伐": 4014,
+    "Siren討伐": 4018,
+    "Benefactor": 4019,
+    "HealTeam": 4020,
+    "QuickOnTheTrigger": 4033,
+}
+
+# 特別な統計
+SPECIAL_STAT_IDS = {
+    "special_event_progress": 300,
+    "weekly_event_progress": 301,
+    "daily_event_info": 302,
+    "dosh_vault_total": 400,
+    "dosh_vault_progress": 402,
+    "match_wins": 3000,
+}
@@ -0,0 +1,183 @@
+"""Streamlitを使わずに戦績の分析結果を JSON / CSV / Parquet で書き出すコマンドライン
+
+使い方:
+    $ STEAM_API_KEY=<APIキー> python -m kf2core.export 76561198000000000 -o stats.json
+    $ python -m kf2core.export --roster roster.txt --from-cache --format csv -o stats.csv
+
+--from-cache は通信せず、ポーラーやUIが履歴ストアに保存した最新のスナップショットを使う。
+cronなどで頻繁に起動できるよう、requests（Steamから取得する時）と pandas（Parquetを
+書き出す時）は必要になった時にだけ読み込む。
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .analysis import analyze_kf2_stats
+from .history import history_store
+from .roster import load_roster
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "csv", "parquet")
+
+# pandas.DataFrame.to_parquet が使う書き込みエンジン（どちらか1つが必要）
+PARQUET_ENGINES = ("pyarrow", "fastparquet")
+
+# Steamから取得する時の同時実行数
+DEFAULT_WORKERS = 4
+
+
+def fetch_snapshots(api_key, steam_ids, app_id, workers=DEFAULT_WORKERS):
+    """Steamから戦績とプレイ時間を並列取得し、SteamID → PlayerSnapshot（失敗時は None）を返す"""
+    import requests
+
+    from .scheduler import BACKGROUND, request_scheduler
+    from .steam_api import fetch_player_playtime, fetch_player_snapshot
+
+    # 画面からの呼び出し分を残すよう、ポーラーと同じ優先度と上限で取得する
+    client = request_scheduler.client(BACKGROUND)
+
+    def fetch(steam_id):
+        try:
+            snapshot = fetch_player_snapshot(api_key, steam_id, app_id, client=client)
+            if snapshot is None:
+                logger.warning("%s: 戦績を取得できませんでした（非公開プロフィールの可能性があります）", steam_id)
+                return None
+            return snapshot._replace(playtime_minutes=fetch_player_playtime(api_key, steam_id, app_id, client=client))
+        except requests.exceptions.RequestException as e:
+            logger.warning("%s: 取得に失敗しました: %s", steam_id, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(steam_ids)))) as executor:
+        return dict(zip(steam_ids, executor.map(fetch, steam_ids)))
+
+
+def load_snapshots(steam_ids, app_id, store=history_store):
+    """履歴ストアから最新のスナップショットを読み込み、SteamID → PlayerSnapshot（なければ None）を返す"""
+    snapshots = {}
+    for steam_id in steam_ids:
+        snapshots[steam_id] = store.latest(steam_id, app_id)
+        if snapshots[steam_id] is None:
+            logger.warning("%s: 保存データがありません", steam_id)
+    return snapshots
+
+
+def build_record(snapshot):
+    """スナップショットを分析し、基本情報と分析結果をまとめた辞書を返す"""
+    record = {
+        "steam_id": snapshot.steam_id,
+        "app_id": snapshot.app_id,
+        "fetched_at": datetime.fromtimestamp(snapshot.checked_at or snapshot.fetched_at, tz=timezone.utc).isoformat(),
+        "playtime_minutes": snapshot.playtime_minutes,
+        "achievements_unlocked": len(snapshot.achievements),
+    }
+    record.update(analyze_kf2_stats(snapshot.stats))
+    return record
+
+
+def flatten(record, prefix=""):
+    """入れ子の辞書を "perks.Commando.level" のような列名の1段の辞書にする（kf2core.batch と同じ列名）"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def write_json(records, out):
+    json.dump(records, out, ensure_ascii=False, indent=2)
+    out.write("\n")
+
+
+def write_csv(records, out):
+    rows = [flatten(record) for record in records]
+    # 値のないPerkなどはプレイヤーによって列が欠けるため、全員分の列を出現順にまとめる
+    fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+    writer = csv.DictWriter(out, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_parquet(records, path):
+    import pandas as pd
+
+    pd.DataFrame([flatten(record) for record in records]).to_parquet(path, index=False)
+
+
+def parquet_available():
+    """parquet の書き込みエンジンがインストールされているか"""
+    return any(importlib.util.find_spec(engine) is not None for engine in PARQUET_ENGINES)
+
+
+def output_format(args):
+    """--format、なければ出力先の拡張子から書き出し形式を決める"""
+    if args.format:
+        return args.format
+    extension = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+    return extension if extension in FORMATS else "json"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m kf2core.export", description="戦績の分析結果を JSON / CSV / Parquet で書き出す")
+    parser.add_argument("steam_ids", nargs="*", help="64ビットSteam ID")
+    parser.add_argument("--roster", help="64ビットSteam IDを1行に1つ書いたファイル")
+    parser.add_argument("--api-key", default=os.environ.get("STEAM_API_KEY"), help="Steam APIキー（既定: 環境変数 STEAM_API_KEY）")
+    parser.add_argument("--app-id", type=int, default=232090)
+    parser.add_argument("--from-cache", action="store_true", help="通信せず、履歴ストアの最新の保存データを使う")
+    parser.add_argument("--save", action="store_true", help="Steamから取得した戦績を履歴ストアにも保存する")
+    parser.add_argument("--format", choices=FORMATS, help="書き出し形式（既定: 出力先の拡張子、なければ json）")
+    parser.add_argument("-o", "--output", help="出力先（既定: 標準出力。parquet では必須）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Steamから取得する時の同時実行数")
+    args = parser.parse_args(argv)
+
+    steam_ids = list(dict.fromkeys(args.steam_ids + (load_roster(args.roster) if args.roster else [])))
+    if not steam_ids:
+        parser.error("Steam ID または --roster を指定してください")
+    if not args.from_cache and not args.api_key:
+        parser.error("--api-key または環境変数 STEAM_API_KEY が必要です（保存データだけを使う場合は --from-cache）")
+    fmt = output_format(args)
+    if fmt == "parquet" and not args.output:
+        parser.error("parquet 形式では -o/--output が必要です")
+    if fmt == "parquet" and not parquet_available():
+        # 取得を始める前に止める
+        parser.error("parquet 形式には pyarrow が必要です（pip install pyarrow）。JSON / CSV はそのまま書き出せます")
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    if args.from_cache:
+        snapshots = load_snapshots(steam_ids, args.app_id)
+    else:
+        snapshots = fetch_snapshots(args.api_key, steam_ids, args.app_id, workers=args.workers)
+        if args.save:
+            for snapshot in snapshots.values():
+                if snapshot is not None:
+                    history_store.record_snapshot(snapshot)
+
+    records = [build_record(snapshot) for snapshot in snapshots.values() if snapshot is not None]
+
+    if fmt == "parquet":
+        write_parquet(records, args.output)
+    else:
+        writer = write_json if fmt == "json" else write_csv
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                writer(records, out)
+        else:
+            writer(records, sys.stdout)
+
+    # 1人でも取得できなければ終了コード 1（cronで検知できるように）
+    return 0 if len(records) == len(steam_ids) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
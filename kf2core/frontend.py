@@ -0,0 +1,267 @@
+"""simple.py / colorful.py が共有するデータ取得処理（Streamlit上でエラーを表示する）
+
+Steam APIの呼び出しと解析は kf2core.steam_api / schema に任せ、ここではプレイヤー単位の
+キャッシュ・並列取得・履歴への保存と、失敗時の st.error / st.warning の表示だけを行う。
+取得結果は kf2core.model の PlayerSnapshot として、両方の画面で同じキャッシュを共有する。
+保存済みのデータを先に表示し、裏で取得した最新データと内容のハッシュを比べて、
+変化があった時だけ再描画する（stale-while-revalidate）ための処理もここに置く。
+Steamへの問い合わせは kf2core.scheduler を通し、APIキーの1日の上限に近づいたら取得を控えて
+保存データやキャッシュで表示する。
+"""
+
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from .analysis import analyze_kf2_stats
+from .cache import memoize
+from .history import history_store
+from .scheduler import INTERACTIVE, QuotaExceeded, request_scheduler
+from .schema import EMPTY_GAME_SCHEMA, fetch_game_schema, schema_cache
+from .steam_api import fetch_player_playtime, fetch_player_snapshot
+
+
+# --- データ取得 ---
+
+# 並列取得のワーカーが、ページの描画後に切り離されたかどうか（start_concurrent_fetch を参照）
+_worker_state = threading.local()
+
+
+def report(level, message):
+    """st.error / st.warning でメッセージを表示する。描画後に切り離された取得のワーカーからは表示しない"""
+    detached = getattr(_worker_state, "detached", None)
+    if detached is not None and detached.is_set():
+        return
+    getattr(st, level)(message)
+
+
+@memoize("player_playtime", key=lambda api_key, steam_id, app_id, priority=INTERACTIVE: (steam_id, app_id), cache_if=bool)
+def get_player_playtime(api_key, steam_id, app_id, priority=INTERACTIVE):
+    """指定されたゲームの総プレイ時間（分）を取得する"""
+    try:
+        return request_scheduler.run(
+            ("playtime", api_key, steam_id, app_id), fetch_player_playtime, api_key, steam_id, app_id, priority=priority,
+        )
+    except QuotaExceeded:
+        # 戦績の取得側で上限に達したことを表示するので、ここでは既定値を返すだけにする
+        return 0
+    except requests.exceptions.RequestException as e:
+        report("error", f"プレイ時間取得中にAPIエラーが発生しました: {e}")
+        return 0
+
+
+@memoize("player_snapshots", key=lambda api_key, steam_id, app_id, priority=INTERACTIVE: (steam_id, app_id), cache_if=lambda snapshot: snapshot is not None)
+def get_player_snapshot(api_key, steam_id, app_id, priority=INTERACTIVE):
+    """指定されたゲームの戦績と実績を PlayerSnapshot として取得する。取得できなければ None"""
+    try:
+        return request_scheduler.run(
+            ("snapshot", api_key, steam_id, app_id), fetch_player_snapshot, api_key, steam_id, app_id, priority=priority,
+        )
+    except QuotaExceeded as e:
+        # 呼び出し側は取得できなかった時と同じく保存データで表示する
+        report("warning", f"戦績データを取得しませんでした: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        report("error", f"戦績データ取得中にAPIエラーが発生しました: {e}")
+        return None
+
+
+def load_game_schema(api_key, app_id, priority=INTERACTIVE):
+    """ゲームのスキーマをGameSchemaとして返す（ディスクキャッシュを優先し、必要な時だけダウンロードする）"""
+    try:
+        # 上限に達した場合も、古いディスクキャッシュがあれば fetch_game_schema がそれを返す
+        return request_scheduler.run(("schema", api_key, app_id), fetch_game_schema, api_key, app_id, priority=priority)
+    except QuotaExceeded as e:
+        report("warning", f"ゲームスキーマを取得しませんでした: {e}")
+        return EMPTY_GAME_SCHEMA
+    except Exception as e:
+        report("error", f"ゲームスキーマの取得中にエラーが発生しました: {e}")
+        return EMPTY_GAME_SCHEMA
+
+
+def load_cached_schema(app_id):
+    """ディスクキャッシュ済みのスキーマを返す（通信はしない）"""
+    cached = schema_cache.load(app_id)
+    return cached.schema if cached else EMPTY_GAME_SCHEMA
+
+
+# --- 履歴 ---
+
+def save_snapshot(snapshot):
+    """取得した戦績をローカルの履歴ストアに保存する（失敗しても表示は続ける）"""
+    try:
+        history_store.record_snapshot(snapshot)
+    except sqlite3.Error as e:
+        st.warning(f"戦績履歴の保存に失敗しました: {e}")
+
+
+def load_latest_snapshot(steam_id, app_id):
+    """履歴ストアから最新のスナップショットを読み込む。なければ None"""
+    try:
+        return history_store.latest(steam_id, app_id)
+    except sqlite3.Error as e:
+        st.warning(f"戦績履歴の読み込みに失敗しました: {e}")
+        return None
+
+
+def load_progress(steam_id, app_id):
+    """履歴ストアから指標ごとのペース（ProgressRate）を読み込む。なければ空の辞書"""
+    try:
+        return history_store.progress(steam_id, app_id)
+    except sqlite3.Error as e:
+        st.warning(f"進捗ペースの読み込みに失敗しました: {e}")
+        return {}
+
+
+# --- APIキーの呼び出し数 ---
+
+def load_quota_usage(api_key):
+    """APIキーの本日の (呼び出し数, 画面からの呼び出しの上限) を返す。台帳が読めなければ None"""
+    try:
+        return request_scheduler.ledger.used(api_key), request_scheduler.limit(INTERACTIVE)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+# --- 並列取得 ---
+
+# 同時に発行するAPIリクエスト数
+FETCH_MAX_WORKERS = 3
+
+
+class ConcurrentFetch(dict):
+    """start_concurrent_fetch の結果（名前 → Future の辞書）"""
+
+    def __init__(self, futures, detached):
+        super().__init__(futures)
+        self._detached = detached
+
+    def detach(self):
+        """ページを描画し終えた後も続く取得として、以後のワーカー内のエラーを表示しないようにする
+
+        結果は poll_revalidation などで Future から受け取り、失敗はそちらで表示する。
+        """
+        self._detached.set()
+
+
+def _init_fetch_worker(ctx, detached):
+    # ワーカースレッドからも st.error を出せるようにスクリプト実行コンテキストを引き継ぐ
+    if ctx is not None:
+        add_script_run_ctx(None, ctx)
+    _worker_state.detached = detached
+
+
+def start_concurrent_fetch(api_key, steam_id, app_id, force_refresh=False):
+    """独立したAPI呼び出し（戦績・プレイ時間・スキーマ）を同時に開始し、ConcurrentFetch を返す
+
+    ボタン操作による取得なので、画面からの呼び出し (INTERACTIVE) として送り、ワーカー内の
+    エラーも今回のスクリプト実行に表示する。保存データを先に表示して取得の完了を待たない場合は、
+    描画後に detach() で切り離す。force_refresh=True の場合はプレイヤー単位のキャッシュを使わずに再取得する。
+    """
+    detached = threading.Event()
+    executor = ThreadPoolExecutor(
+        max_workers=FETCH_MAX_WORKERS,
+        initializer=_init_fetch_worker,
+        initargs=(get_script_run_ctx(), detached),
+    )
+    futures = {
+        "snapshot": executor.submit(get_player_snapshot, api_key, steam_id, app_id, force_refresh=force_refresh),
+        "playtime": executor.submit(get_player_playtime, api_key, steam_id, app_id, force_refresh=force_refresh),
+        "schema": executor.submit(load_game_schema, api_key, app_id),
+    }
+    # 投入済みのリクエストは完了まで実行される
+    executor.shutdown(wait=False)
+    return ConcurrentFetch(futures, detached)
+
+
+def collect_result(future, default, label):
+    """Futureの結果を取得する。失敗した場合はエラーを表示して既定値を返す"""
+    try:
+        return future.result()
+    except Exception as e:
+        st.error(f"{label}の取得中にエラーが発生しました: {e}")
+        return default
+
+
+# --- 保存済みデータの先行表示（stale-while-revalidate） ---
+
+# 取得がこの秒数以内に終わる場合（キャッシュ済みなど）は保存データを挟まずにそのまま表示する
+REVALIDATE_GRACE_SECONDS = 0.1
+
+# バックグラウンド取得の完了を確認する間隔（秒）
+REVALIDATE_POLL_SECONDS = 1.0
+
+
+def finishes_soon(future, timeout=REVALIDATE_GRACE_SECONDS):
+    """Future が timeout 秒以内に完了したかを返す"""
+    return bool(wait([future], timeout=timeout).done)
+
+
+def poll_revalidation(futures, current):
+    """バックグラウンドで取得した最新の戦績を確認し、(状態, 表示するスナップショット) を返す
+
+    状態は "pending"（取得中）/ "failed"（取得できなかった）/ "unchanged"（内容が同じ）/
+    "changed"（内容が変わった）。取得できた場合は履歴にも保存する。
+    """
+    if not (futures["snapshot"].done() and futures["playtime"].done()):
+        return "pending", current
+    fresh = collect_result(futures["snapshot"], None, "戦績データ")
+    if fresh is None:
+        return "failed", current
+    # プレイ時間だけ取得に失敗した場合（0）は、保存データの値を使って内容の比較がずれないようにする
+    playtime_minutes = collect_result(futures["playtime"], 0, "プレイ時間") or current.playtime_minutes
+    fresh = fresh._replace(playtime_minutes=playtime_minutes)
+    save_snapshot(fresh)
+    return ("unchanged" if fresh.content_hash() == current.content_hash() else "changed"), fresh
+
+
+# --- 一括比較 ---
+
+# 一括比較で同時に取得するプレイヤー数の上限
+SQUAD_MAX_WORKERS = 8
+
+
+def parse_steam_ids(text):
+    """改行・カンマ・空白区切りのSteamID64を、入力順のまま重複を除いたリストにする"""
+    steam_ids = []
+    for token in re.split(r"[\s,]+", text):
+        if token.isdigit() and token not in steam_ids:
+            steam_ids.append(token)
+    return steam_ids
+
+
+def fetch_squad(api_key, steam_ids, app_id, force_refresh=False):
+    """複数プレイヤーの戦績を同時実行数を制限して並列取得・分析する
+
+    スキーマは全員で1回だけ読み込む。SteamID → {"analysis", "achieved"} の辞書と、
+    全実績数を返す（取得できなかったプレイヤーの値は None）。
+    """
+    ctx = get_script_run_ctx()
+    max_workers = max(1, min(SQUAD_MAX_WORKERS, len(steam_ids)))
+    with ThreadPoolExecutor(max_workers=max_workers + 1, initializer=add_script_run_ctx, initargs=(None, ctx)) as executor:
+        schema_future = executor.submit(load_game_schema, api_key, app_id)
+        futures = {
+            steam_id: executor.submit(get_player_snapshot, api_key, steam_id, app_id, force_refresh=force_refresh)
+            for steam_id in steam_ids
+        }
+
+        fetched = {}
+        for steam_id, future in futures.items():
+            snapshot = collect_result(future, None, f"{steam_id} の戦績データ")
+            if snapshot is not None:
+                save_snapshot(snapshot)
+                fetched[steam_id] = snapshot
+
+        results = {
+            steam_id: {"analysis": analyze_kf2_stats(snapshot.stats), "achieved": len(snapshot.achievements)}
+            for steam_id, snapshot in fetched.items()
+        }
+        squad = {steam_id: results.get(steam_id) for steam_id in steam_ids}
+
+        schema = collect_result(schema_future, EMPTY_GAME_SCHEMA, "ゲームスキーマ")
+    return squad, schema.total_achievements
@@ -0,0 +1,443 @@
+"""取得した戦績のスナップショットを保存するローカル履歴ストア（SQLite）
+
+統計は数百項目あるが、1回のプレイで変わるのはごく一部なので、一定間隔ごとの
+キーフレーム（全統計）と、その間の差分（変化した統計のみ）で保存する。
+任意の時点の状態は直前のキーフレームから差分を適用するだけで復元できる。
+何も変わっていない取得は新しい行を作らず、最新スナップショットの確認時刻だけを
+更新するため、保存量はポーリング頻度ではなくプレイ量に比例する。
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .config import DEFAULT_CACHE_DIR
+from .model import PlayerSnapshot
+from .progress import PROGRESS_SCHEMA_SQL, load_progress, progress_values, update_progress
+
+DEFAULT_HISTORY_PATH = DEFAULT_CACHE_DIR / "history.sqlite3"
+
+# この件数ごとに全統計を持つキーフレームを作る（復元時に適用する差分の上限）
+KEYFRAME_INTERVAL = 32
+
+_SCHEMA_VERSION = 2
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    steam_id TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    playtime_minutes INTEGER,
+    achievements TEXT,  -- キーフレームまたは前回から変化した場合のみJSON、変化なしはNULL
+    is_keyframe INTEGER NOT NULL DEFAULT 0,
+    checked_at REAL  -- 変化がないことを最後に確認した時刻
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_player_time ON snapshots (steam_id, app_id, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_time ON snapshots (fetched_at);
+
+CREATE TABLE IF NOT EXISTS stat_changes (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, name)
+) WITHOUT ROWID;
+"""
+
+
+# 以前の名前（PlayerSnapshot は kf2core.model に移動した）
+Snapshot = PlayerSnapshot
+
+
+class HistoryStore:
+    """スナップショットをSQLiteに追記し、最新の状態や時系列を読み出す"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = Path(path)
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()  # 書き込みの直列化
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self._initialized:
+            with self._init_lock:
+                conn.execute("PRAGMA journal_mode = WAL")
+                self._migrate(conn)
+                self._initialized = True
+        return conn
+
+    def _migrate(self, conn):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(snapshots)")}
+        with conn:
+            if columns and "is_keyframe" not in columns:
+                # 差分保存導入前の形式: 各プレイヤーの最初のスナップショットが全統計を持っている
+                conn.execute("ALTER TABLE snapshots ADD COLUMN is_keyframe INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE snapshots ADD COLUMN checked_at REAL")
+                conn.execute(
+                    "UPDATE snapshots SET is_keyframe = 1"
+                    " WHERE id IN (SELECT MIN(id) FROM snapshots GROUP BY steam_id, app_id)"
+                )
+            conn.executescript(_SCHEMA_SQL)
+            conn.executescript(PROGRESS_SCHEMA_SQL)
+            if version < _SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    # --- 書き込み ---
+
+    def record(self, steam_id, app_id, stats, achievements, playtime_minutes=None, fetched_at=None):
+        """スナップショットを保存する。前回から変化した統計の数を返す
+
+        何も変化していなければ行を追加せず、最新スナップショットの確認時刻を更新する。
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    return self._record(conn, steam_id, app_id, stats, achievements, playtime_minutes, fetched_at)
+            finally:
+                conn.close()
+
+    def record_snapshot(self, snapshot):
+        """PlayerSnapshot を保存する。前回から変化した統計の数を返す"""
+        return self.record(
+            snapshot.steam_id, snapshot.app_id, snapshot.stats, snapshot.achievements,
+            snapshot.playtime_minutes, snapshot.fetched_at,
+        )
+
+    def _record(self, conn, steam_id, app_id, stats, achievements, playtime_minutes, fetched_at):
+        previous, previous_id, since_keyframe = self._reconstruct(conn, steam_id, app_id)
+
+        if previous is None:
+            changes = dict(stats)
+        else:
+            changes = {name: value for name, value in stats.items() if previous.stats.get(name) != value}
+            achievements_changed = achievements != previous.achievements
+            playtime_changed = playtime_minutes is not None and playtime_minutes != previous.playtime_minutes
+            if not changes and not achievements_changed and not playtime_changed:
+                conn.execute("UPDATE snapshots SET checked_at = ? WHERE id = ?", (fetched_at, previous_id))
+                return 0
+
+        is_keyframe = previous is None or since_keyframe >= self.keyframe_interval - 1
+        if is_keyframe and previous is not None:
+            # キーフレームは全統計を持つ（前回から消えた統計は引き継ぐ）
+            stored = {**previous.stats, **stats}
+        else:
+            stored = changes
+        store_achievements = is_keyframe or achievements != previous.achievements
+        if playtime_minutes is None and previous is not None:
+            playtime_minutes = previous.playtime_minutes
+
+        cursor = conn.execute(
+            "INSERT INTO snapshots (steam_id, app_id, fetched_at, playtime_minutes, achievements, is_keyframe)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                steam_id, app_id, fetched_at, playtime_minutes,
+                json.dumps(achievements, ensure_ascii=False) if store_achievements else None,
+                int(is_keyframe),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO stat_changes (snapshot_id, name, value) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, name, value) for name, value in stored.items()],
+        )
+        # ペースの集計も同じトランザクションで更新する（差分ではなく全統計の値から求める）
+        current_stats = stored if is_keyframe else {**previous.stats, **stats}
+        update_progress(conn, steam_id, app_id, fetched_at, progress_values(current_stats, achievements), playtime_minutes)
+        return len(changes)
+
+    # --- 読み出し ---
+
+    def latest(self, steam_id, app_id):
+        """最新の状態を PlayerSnapshot として返す。履歴がなければ None"""
+        conn = self._connect()
+        try:
+            return self._reconstruct(conn, steam_id, app_id)[0]
+        finally:
+            conn.close()
+
+    def latest_many(self, steam_ids, app_id):
+        """複数プレイヤーの最新の状態を1つの接続で読み、SteamID → PlayerSnapshot を返す（履歴がなければ含めない）"""
+        conn = self._connect()
+        try:
+            snapshots = {}
+            for steam_id in steam_ids:
+                snapshot = self._reconstruct(conn, steam_id, app_id)[0]
+                if snapshot is not None:
+                    snapshots[steam_id] = snapshot
+            return snapshots
+        finally:
+            conn.close()
+
+    def state_at(self, steam_id, app_id, at):
+        """時刻 at 時点の状態を PlayerSnapshot として返す。それ以前の履歴がなければ None"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT MAX(id) FROM snapshots WHERE steam_id = ? AND app_id = ? AND fetched_at <= ?",
+                (steam_id, app_id, at),
+            ).fetchone()
+            if row[0] is None:
+                return None
+            return self._reconstruct(conn, steam_id, app_id, upto_id=row[0])[0]
+        finally:
+            conn.close()
+
+    def progress(self, steam_id, app_id, now=None):
+        """指標 → ProgressRate を返す（kf2core.progress を参照）
+
+        集計の導入前から履歴のあるプレイヤーは、初回だけ履歴全体から集計を作る。
+        """
+        conn = self._connect()
+        try:
+            rates = load_progress(conn, steam_id, app_id, now)
+            has_history = conn.execute(
+                "SELECT 1 FROM snapshots WHERE steam_id = ? AND app_id = ? LIMIT 1", (steam_id, app_id)
+            ).fetchone() is not None
+        finally:
+            conn.close()
+        if rates or not has_history:
+            return rates
+        self.rebuild_progress(steam_id, app_id)
+        conn = self._connect()
+        try:
+            return load_progress(conn, steam_id, app_id, now)
+        finally:
+            conn.close()
+
+    def rebuild_progress(self, steam_id, app_id):
+        """プレイヤーのペースの集計を履歴全体から作り直す"""
+        states = list(self.iter_states(steam_id, app_id))
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM progress WHERE steam_id = ? AND app_id = ?", (steam_id, app_id))
+                    for snapshot in states:
+                        update_progress(
+                            conn, steam_id, app_id, snapshot.fetched_at,
+                            progress_values(snapshot.stats, snapshot.achievements), snapshot.playtime_minutes,
+                        )
+            finally:
+                conn.close()
+
+    def _reconstruct(self, conn, steam_id, app_id, upto_id=None):
+        """直前のキーフレームから差分を適用して状態を復元する
+
+        (PlayerSnapshot, そのスナップショットのid, キーフレームより後の差分数) を返す。
+        """
+        upto_clause = "" if upto_id is None else " AND id <= ?"
+        params = (steam_id, app_id) + (() if upto_id is None else (upto_id,))
+        keyframe = conn.execute(
+            "SELECT MAX(id) FROM snapshots WHERE steam_id = ? AND app_id = ? AND is_keyframe = 1" + upto_clause,
+            params,
+        ).fetchone()[0]
+        if keyframe is None:
+            return None, None, 0
+
+        snapshots = conn.execute(
+            "SELECT id, fetched_at, playtime_minutes, achievements, checked_at FROM snapshots"
+            " WHERE steam_id = ? AND app_id = ? AND id >= ?" + upto_clause + " ORDER BY id",
+            (steam_id, app_id, keyframe) + params[2:],
+        ).fetchall()
+        changes = conn.execute(
+            "SELECT c.name, c.value FROM stat_changes c JOIN snapshots s ON s.id = c.snapshot_id"
+            " WHERE s.steam_id = ? AND s.app_id = ? AND s.id >= ?" + upto_clause.replace("id", "s.id") +
+            " ORDER BY s.id",
+            (steam_id, app_id, keyframe) + params[2:],
+        ).fetchall()
+
+        stats = {row["name"]: row["value"] for row in changes}
+        achievements = []
+        for row in snapshots:
+            if row["achievements"] is not None:
+                achievements = json.loads(row["achievements"])
+        head = snapshots[-1]
+        snapshot = PlayerSnapshot(
+            steam_id=steam_id,
+            app_id=app_id,
+            fetched_at=head["fetched_at"],
+            stats=stats,
+            achievements=achievements,
+            playtime_minutes=head["playtime_minutes"],
+            checked_at=head["checked_at"],
+        )
+        return snapshot, head["id"], len(snapshots) - 1
+
+    def iter_states(self, steam_id, app_id, since=None):
+        """各スナップショット時点の状態を時刻順に返すジェネレーター（全体を1回だけ走査する）"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT s.id, s.fetched_at, s.playtime_minutes, s.achievements, s.checked_at, c.name, c.value"
+                " FROM snapshots s LEFT JOIN stat_changes c ON c.snapshot_id = s.id"
+                " WHERE s.steam_id = ? AND s.app_id = ? ORDER BY s.id",
+                (steam_id, app_id),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        stats = {}
+        achievements = []
+        head = None
+        for row in rows:
+            if head is not None and row["id"] != head["id"]:
+                if since is None or head["fetched_at"] >= since:
+                    yield self._snapshot_from(steam_id, app_id, head, stats, achievements)
+            if head is None or row["id"] != head["id"]:
+                head = row
+                if row["achievements"] is not None:
+                    achievements = json.loads(row["achievements"])
+            if row["name"] is not None:
+                stats[row["name"]] = row["value"]
+        if head is not None and (since is None or head["fetched_at"] >= since):
+            yield self._snapshot_from(steam_id, app_id, head, stats, achievements)
+
+    @staticmethod
+    def _snapshot_from(steam_id, app_id, head, stats, achievements):
+        return PlayerSnapshot(
+            steam_id=steam_id,
+            app_id=app_id,
+            fetched_at=head["fetched_at"],
+            stats=dict(stats),
+            achievements=achievements,
+            playtime_minutes=head["playtime_minutes"],
+            checked_at=head["checked_at"],
+        )
+
+    def timeline(self, steam_id, app_id, since=None):
+        """(取得時刻, 前回から変化した統計の辞書) のリストを時刻順に返す"""
+        timeline = []
+        previous = {}
+        for snapshot in self.iter_states(steam_id, app_id):
+            changes = {name: value for name, value in snapshot.stats.items() if previous.get(name) != value}
+            previous = snapshot.stats
+            if since is None or snapshot.fetched_at >= since:
+                timeline.append((snapshot.fetched_at, changes))
+        return timeline
+
+    def players(self, app_id):
+        """履歴のあるSteamIDと最終確認時刻の一覧を返す"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT steam_id, MAX(COALESCE(checked_at, fetched_at)) AS fetched_at FROM snapshots"
+                " WHERE app_id = ? GROUP BY steam_id",
+                (app_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row["steam_id"]: row["fetched_at"] for row in rows}
+
+    # --- 圧縮 ---
+
+    def compact(self, before, resolution=24 * 60 * 60, vacuum=False):
+        """before より古い履歴を resolution 秒ごとに1件へまとめ、キーフレームを振り直す
+
+        各区間の最後の状態は正確に残すため、区間の境界時点と最新の状態は変わらない。
+        削除したスナップショット数を返す。
+        """
+        removed = 0
+        with self._lock:
+            conn = self._connect()
+            try:
+                players = conn.execute(
+                    "SELECT DISTINCT steam_id, app_id FROM snapshots WHERE fetched_at < ?", (before,)
+                ).fetchall()
+                for player in players:
+                    with conn:
+                        removed += self._compact_player(conn, player["steam_id"], player["app_id"], before, resolution)
+                if vacuum:
+                    conn.execute("VACUUM")
+            finally:
+                conn.close()
+        return removed
+
+    def _compact_player(self, conn, steam_id, app_id, before, resolution):
+        old_ids = [
+            row["id"] for row in conn.execute(
+                "SELECT id FROM snapshots WHERE steam_id = ? AND app_id = ? AND fetched_at < ? ORDER BY id",
+                (steam_id, app_id, before),
+            )
+        ]
+        if not old_ids:
+            return 0
+
+        # 古い区間の各時点の状態を先頭から復元する
+        states = []
+        for snapshot in self.iter_states(steam_id, app_id):
+            if len(states) == len(old_ids):
+                break
+            states.append(snapshot)
+
+        # 区間ごとに最後のスナップショットだけを残す
+        retained = []
+        for snapshot_id, snapshot in zip(old_ids, states):
+            bucket = int(snapshot.fetched_at // resolution)
+            if retained and retained[-1][0] == bucket:
+                retained[-1] = (bucket, snapshot_id, snapshot)
+            else:
+                retained.append((bucket, snapshot_id, snapshot))
+        retained_ids = {snapshot_id for _, snapshot_id, _ in retained}
+        dropped = [snapshot_id for snapshot_id in old_ids if snapshot_id not in retained_ids]
+        conn.executemany("DELETE FROM snapshots WHERE id = ?", [(snapshot_id,) for snapshot_id in dropped])
+
+        # 残したスナップショットをキーフレーム＋差分として書き直す
+        previous = None
+        for index, (_, snapshot_id, snapshot) in enumerate(retained):
+            is_keyframe = index % self.keyframe_interval == 0
+            if is_keyframe:
+                stored = snapshot.stats
+            else:
+                stored = {name: value for name, value in snapshot.stats.items() if previous.stats.get(name) != value}
+            store_achievements = is_keyframe or snapshot.achievements != previous.achievements
+            conn.execute("DELETE FROM stat_changes WHERE snapshot_id = ?", (snapshot_id,))
+            conn.executemany(
+                "INSERT INTO stat_changes (snapshot_id, name, value) VALUES (?, ?, ?)",
+                [(snapshot_id, name, value) for name, value in stored.items()],
+            )
+            conn.execute(
+                "UPDATE snapshots SET is_keyframe = ?, achievements = ? WHERE id = ?",
+                (
+                    int(is_keyframe),
+                    json.dumps(snapshot.achievements, ensure_ascii=False) if store_achievements else None,
+                    snapshot_id,
+                ),
+            )
+            previous = snapshot
+        return len(dropped)
+
+
+# プロセス全体で共有するストア
+history_store = HistoryStore()
+
+
+def main(argv=None):
+    """古い履歴を圧縮する"""
+    parser = argparse.ArgumentParser(prog="python -m kf2core.history", description="KF2戦績履歴の管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="古い履歴をまとめてキーフレームを振り直す")
+    compact_parser.add_argument("--older-than-days", type=float, default=30, help="これより古い履歴を対象にする")
+    compact_parser.add_argument("--resolution-hours", type=float, default=24, help="この時間ごとに1件へまとめる")
+    compact_parser.add_argument("--vacuum", action="store_true", help="圧縮後にデータベースファイルを縮小する")
+
+    args = parser.parse_args(argv)
+
+    before = time.time() - args.older_than_days * 24 * 60 * 60
+    removed = history_store.compact(before, resolution=args.resolution_hours * 60 * 60, vacuum=args.vacuum)
+    print(f"{removed} 件のスナップショットをまとめました")
+
+
+if __name__ == "__main__":
+    main()
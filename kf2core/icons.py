@@ -0,0 +1,252 @@
+"""実績アイコンのサムネイルのディスクキャッシュと、ページ単位のスプライト画像
+
+アイコンは初めて表示する時にだけ、並列数に上限を付けてダウンロードする。縮小したPNGは
+内容の SHA-256 をファイル名として保存し（同じ画像は1ファイルにまとまる）、URL → ハッシュの
+対応表も保存するため、2回目以降はプロセスを再起動してもアイコンの通信は発生しない。
+
+ダウンロードはプロセスで共有するスレッドプールで行い、同じURLを同時に2回取得しない。
+画面からは待つ時間に上限（timeout）を付けて呼び、間に合わなかったアイコンは取得を続けたまま
+先に描画する（pending() で取得中かどうかを確認できる）。
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+from .cache import TTLCache, get_cache
+from .config import DEFAULT_CACHE_DIR
+from .metrics import metrics
+from .steam_client import SteamClient
+
+# サムネイルの一辺（ピクセル）
+ICON_SIZE = 48
+
+# ダウンロードの同時実行数
+ICON_FETCH_WORKERS = 8
+
+# アイコンは表示を待たせないよう、APIより短いタイムアウトで1回だけ再試行する
+ICON_FETCH_TIMEOUT = (3.05, 10)
+ICON_FETCH_RETRIES = 1
+
+# 画面の描画でアイコンのダウンロードを待つ最長の秒数と、待ちきれなかった時に取得の完了を確認する間隔
+ICON_RENDER_WAIT_SECONDS = 0.5
+ICON_POLL_SECONDS = 1.0
+
+# ダウンロードに失敗したURLを再試行しない秒数
+ICON_FAILURE_TTL_SECONDS = 10 * 60
+
+# スプライト画像の1行に並べるアイコン数と、作ったスプライトをメモリに保持する時間・件数
+SPRITE_COLUMNS = 8
+SPRITE_CACHE_TTL_SECONDS = 30 * 60
+SPRITE_CACHE_MAXSIZE = 32
+
+
+class IconCache:
+    """アイコンのURLごとに縮小済みPNGをディスクに保存するキャッシュ"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, size=ICON_SIZE, max_workers=ICON_FETCH_WORKERS, client=None):
+        self.icon_dir = Path(cache_dir) / "icons"
+        self.size = size
+        self.max_workers = max_workers
+        self.client = client or SteamClient(timeout=ICON_FETCH_TIMEOUT, max_retries=ICON_FETCH_RETRIES)
+        self._index = None  # URL → サムネイルのハッシュ
+        self._failures = TTLCache(ICON_FAILURE_TTL_SECONDS, 4096)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._inflight = {}  # ダウンロード中のURL → Future
+
+    def _index_path(self):
+        return self.icon_dir / f"index-{self.size}.json"
+
+    def _blob_path(self, digest):
+        return self.icon_dir / digest[:2] / f"{digest}.png"
+
+    def _load_index(self):
+        """URL → ハッシュ の対応表を返す（初回だけディスクから読む。ロックを取って呼ぶこと）"""
+        if self._index is None:
+            try:
+                with open(self._index_path(), encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        path = self._index_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+
+    def thumbnail(self, data):
+        """画像のバイト列を一辺 size 以内のPNGに縮小する"""
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGBA")
+            image.thumbnail((self.size, self.size))
+            output = io.BytesIO()
+            image.save(output, format="PNG", optimize=True)
+        return output.getvalue()
+
+    def _download(self, url):
+        """アイコンを取得して縮小・保存し、ハッシュを返す。失敗した場合は None"""
+        try:
+            response = self.client.get(url, headers={"Accept": "image/*"}, stage="fetch.icon")
+            response.raise_for_status()
+            with metrics.timer("parse.icon"):
+                png = self.thumbnail(response.content)
+        except (requests.exceptions.RequestException, OSError):
+            # OSError は Pillow が読めない画像（UnidentifiedImageError）を含む
+            metrics.incr("icons.errors")
+            self._failures.set(url, True)
+            return None
+
+        digest = hashlib.sha256(png).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, path)
+        metrics.incr("icons.downloaded")
+        return digest
+
+    def _fetch(self, url):
+        """バックグラウンドで1件ダウンロードし、対応表に追加する"""
+        try:
+            digest = self._download(url)
+            if digest:
+                with self._lock:
+                    self._load_index()[url] = digest
+                    self._save_index()
+            return digest
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def _start(self, url):
+        """url のダウンロードを始める（実行中ならその Future を返す）"""
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="icon-fetch")
+                future = self._inflight[url] = self._executor.submit(self._fetch, url)
+            return future
+
+    def pending(self, urls):
+        """urls のうち、まだダウンロード中のURLの集合を返す"""
+        with self._lock:
+            return {url for url in urls if url in self._inflight}
+
+    def ensure(self, urls, timeout=None):
+        """urls のアイコンをキャッシュに揃え、URL → サムネイルのパス を返す（取得できなかったURLは含めない）
+
+        timeout 秒を過ぎても終わらないダウンロードは待たずに返す（取得はバックグラウンドで続く）。
+        None の場合はすべて終わるまで待つ。
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        with self._lock:
+            index = dict(self._load_index())
+
+        cached = {url: index[url] for url in urls if url in index and self._blob_path(index[url]).exists()}
+        missing = [url for url in urls if url not in cached and self._failures.get(url) is None]
+        metrics.incr("icons.cached", len(cached))
+        if missing:
+            wait([self._start(url) for url in missing], timeout=timeout)
+            with self._lock:
+                index = self._load_index()
+                cached.update({url: index[url] for url in missing if url in index})
+
+        return {url: self._blob_path(cached[url]) for url in urls if url in cached}
+
+    def sprite(self, urls, timeout=None):
+        """urls のアイコンを1枚のPNGに並べ、(PNGのバイト列, URL → 左上の座標 (x, y)) を返す
+
+        取得できなかった（timeout までに間に合わなかった）アイコンは座標に含めない。
+        1つも取得できなければ (None, {}) を返す。
+        """
+        paths = self.ensure(urls, timeout=timeout)
+        digests = list(dict.fromkeys(path.stem for path in paths.values()))
+        if not digests:
+            return None, {}
+
+        columns = min(SPRITE_COLUMNS, len(digests))
+        offsets = {digest: ((i % columns) * self.size, (i // columns) * self.size) for i, digest in enumerate(digests)}
+
+        sprites = get_cache("icon_sprites", ttl=SPRITE_CACHE_TTL_SECONDS, maxsize=SPRITE_CACHE_MAXSIZE)
+        key = (self.size, tuple(digests))
+        png = sprites.get(key)
+        if png is None:
+            with metrics.timer("render.icon_sprite"):
+                rows = -(-len(digests) // columns)
+                sheet = Image.new("RGBA", (columns * self.size, rows * self.size), (0, 0, 0, 0))
+                for digest, offset in offsets.items():
+                    with Image.open(self._blob_path(digest)) as icon:
+                        sheet.paste(icon.convert("RGBA"), offset)
+                output = io.BytesIO()
+                sheet.save(output, format="PNG", optimize=True)
+                png = output.getvalue()
+            sprites.set(key, png)
+
+        return png, {url: offsets[path.stem] for url, path in paths.items()}
+
+    def purge(self):
+        """保存済みのサムネイルと対応表をすべて削除し、削除したサムネイルの件数を返す"""
+        with self._lock:
+            self._index = {}
+            removed = len(list(self.icon_dir.glob("*/*.png")))
+            shutil.rmtree(self.icon_dir, ignore_errors=True)
+        get_cache("icon_sprites", ttl=SPRITE_CACHE_TTL_SECONDS, maxsize=SPRITE_CACHE_MAXSIZE).clear()
+        return removed
+
+
+# プロセス全体で共有するキャッシュ
+icon_cache = IconCache()
+
+
+def schema_icon_urls(schema):
+    """スキーマの全実績のアイコン（解除済み・未解除）のURLを返す"""
+    return [
+        url for info in schema.achievements.values()
+        for url in (info.get("icon", ""), info.get("icongray", "")) if url
+    ]
+
+
+def main(argv=None):
+    """キャッシュ済みスキーマの全アイコンを事前取得 (warm) するか、アイコンキャッシュを削除 (purge) する"""
+    from .schema import schema_cache
+
+    parser = argparse.ArgumentParser(prog="python -m kf2core.icons", description="実績アイコンキャッシュの管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = subparsers.add_parser("warm", help="キャッシュ済みスキーマの全アイコンを取得する")
+    warm_parser.add_argument("--app-id", type=int, default=232090)
+
+    subparsers.add_parser("purge", help="アイコンキャッシュを削除する")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        cached = schema_cache.load(args.app_id)
+        if cached is None:
+            parser.error(f"app_id={args.app_id} のスキーマがキャッシュにありません（先に python -m kf2core.schema warm を実行してください）")
+        urls = schema_icon_urls(cached.schema)
+        paths = icon_cache.ensure(urls)
+        print(f"app_id={args.app_id}: アイコン {len(paths)} / {len(set(urls))} 件をキャッシュしました")
+    else:
+        removed = icon_cache.purge()
+        print(f"{removed} 件のアイコンを削除しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""レスポンス本文を少しずつ読みながら、必要な部分だけを取り出すJSONの逐次デコーダー
+
+response.json() は本文全体の文字列と、全体のオブジェクトを一度に作る。ここでは本文を
+チャンク単位で読み、目的のキーまでは値を1つずつ読み飛ばし、値は json の C 実装
+（JSONDecoder.raw_decode）でデコードする。同時にメモリに載るのは、読み込み中のチャンクと
+値1つ分だけで済み、目的の値が見つかった時点で読むのをやめられる。
+"""
+
+import codecs
+import json
+import re
+
+from .metrics import metrics
+
+# 1回に読み込むバイト数
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+# pairs() の高速経路で扱う数値（JSONの数値の文法どおり）
+_NUMBER = r"(-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?)"
+
+
+class JSONStream:
+    """bytes のチャンクのイテレーターから、JSONを先頭から順に読むデコーダー
+
+    keys() / items() はコンテナの中を1段ずつ進むジェネレーターで、呼び出し側は次のキー
+    （要素）に進む前に、その値を value() / skip() / keys() / items() のいずれかで読むこと。
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    @classmethod
+    def from_response(cls, response, chunk_size=CHUNK_SIZE):
+        """stream=True で取得した requests のレスポンス本文を読む（受信量を http.bytes に記録する）"""
+        def chunks():
+            for chunk in response.iter_content(chunk_size):
+                metrics.incr("http.bytes", len(chunk))
+                yield chunk
+        return cls(chunks())
+
+    def _fill(self, minimum=1):
+        """読み終えた部分を捨て、少なくとも minimum 文字を読み足す。本文の終わりなら False"""
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        added = 0
+        while added < minimum and not self._eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                text = self._utf8.decode(b"", final=True)
+            else:
+                text = self._utf8.decode(chunk)
+            self._buffer += text
+            added += len(text)
+        return added > 0
+
+    def peek(self):
+        """空白を読み飛ばし、次の値（または区切り）の1文字目を返す。本文の終わりなら空文字列"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars):
+        """次の1文字が chars のいずれかであることを確かめて読み進め、その文字を返す"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def value(self):
+        """次の値を1つデコードして返す"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                end = None
+            # 数値はバッファの終わりで途切れているかもしれないので、続きがある場合は読み足してから確定する
+            if end is not None and (end < len(self._buffer) or self._eof):
+                self._pos = end
+                return value
+            # 大きな値でデコードのやり直しが続かないよう、未読分と同じだけ読み足す
+            self._fill(max(len(self._buffer) - self._pos, CHUNK_SIZE))
+
+    def skip(self):
+        """次の値を読み飛ばす"""
+        self.value()
+
+    def keys(self):
+        """オブジェクトのキーを順に返す（値はキーごとに呼び出し側で読む）"""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def items(self):
+        """配列の要素の位置で止まりながら、要素の番号を順に返す（要素は呼び出し側で読む）"""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            if self._expect(",]") == "]":
+                return
+            index += 1
+
+    def values(self):
+        """配列の要素を1つずつデコードして返す"""
+        for _ in self.items():
+            yield self.value()
+
+    def pairs(self, key_field, value_field):
+        """配列の {key_field: 文字列, value_field: 値} の要素を、辞書を作らずに (キー, 値) の組で返す
+
+        エスケープのない文字列と数値だけの要素（Steamの統計の形式）は、後ろの区切りまで含めて
+        正規表現1回で読む。それ以外の要素（キーの順序が違う、他のフィールドがあるなど）や
+        チャンクの境目にかかった要素は1つずつ読む。
+        """
+        fast = re.compile(
+            r'[ \t\n\r]*\{[ \t\n\r]*%s[ \t\n\r]*:[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*,[ \t\n\r]*%s[ \t\n\r]*:[ \t\n\r]*%s'
+            r'[ \t\n\r]*\}[ \t\n\r]*([,\]])'
+            % (re.escape(json.dumps(key_field)), re.escape(json.dumps(value_field)), _NUMBER)
+        )
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            match = fast.match(self._buffer, self._pos)
+            if match:
+                name, number, fraction, exponent, separator = match.groups()
+                self._pos = match.end()
+                yield name, (float(number) if fraction or exponent else int(number))
+            else:
+                key = value = None
+                for field in self.keys():
+                    if field == key_field:
+                        key = self.value()
+                    elif field == value_field:
+                        value = self.value()
+                    else:
+                        self.skip()
+                yield key, value
+                separator = self._expect(",]")
+            if separator == "]":
+                return
+
+    def find(self, *path):
+        """オブジェクトのキーを path の順にたどり、その値の直前まで進む。途中でキーがなければ False"""
+        for key in path:
+            if self.peek() != "{":
+                return False
+            for name in self.keys():
+                if name == key:
+                    break
+                self.skip()
+            else:
+                return False
+        return True
@@ -0,0 +1,230 @@
+"""履歴ストアに保存されたプレイヤー全員の戦績ランキング（指標ごとの順位インデックス）
+
+指標ごとに (-値, SteamID) を昇順に並べたリストを持ち、プレイヤーの戦績が変わった時は
+その人の古いキーを二分探索で取り除き、新しいキーを挿入するだけで更新する。
+「自分の順位」は自分より大きい値の件数を二分探索で数え、上位N人は先頭から切り出すので、
+どちらも全員を走査し直さない。履歴ストアからは、前回の読み込み以降に更新された
+プレイヤーのスナップショットだけを読み直す。初回の読み込みなど読み直す人数が多い時は、
+kf2core.batch の列指向の分析で全員分の指標をまとめて求める。
+
+使い方:
+    $ python -m kf2core.leaderboard                      # 指標の一覧
+    $ python -m kf2core.leaderboard perks.Sharpshooter.xp -n 20 --steam-id 76561198000000000
+"""
+
+import argparse
+import threading
+import time
+from bisect import bisect_left, insort
+
+from .analysis import analyze_kf2_stats
+from .batch import analyze_frame
+from .constants import KILL_STAT_IDS, PERK_STAT_IDS, PERSONAL_BEST_IDS
+from .history import history_store
+from .metrics import metrics
+
+# 指標のキー（analyze_kf2_stats の結果のパス） → 表示名
+LEADERBOARD_METRICS = {
+    **{f"perks.{perk_name}.xp": f"{perk_name} XP" for perk_name in PERK_STAT_IDS},
+    **{f"kills.{name}": name for name in KILL_STAT_IDS},
+    **{f"personal_bests.{name}": f"{name} PB" for name in PERSONAL_BEST_IDS},
+}
+
+# refresh() で履歴ストアを確認する最短間隔（秒）
+REFRESH_INTERVAL_SECONDS = 30
+
+# 読み直す人数がこれ以上なら analyze_frame でまとめて分析する（少ない時は1件ずつの方が速い）
+BATCH_MIN_PLAYERS = 200
+
+
+def metric_values(analysis):
+    """analyze_kf2_stats の結果から、ランキング対象の指標の値を取り出す（0 以下の指標は含めない）"""
+    values = {f"perks.{perk_name}.xp": perk["xp"] for perk_name, perk in analysis["perks"].items()}
+    for category in ("kills", "personal_bests"):
+        values.update({f"{category}.{name}": value for name, value in analysis[category].items()})
+    return {metric: value for metric, value in values.items() if metric in LEADERBOARD_METRICS and value > 0}
+
+
+def frame_metric_values(frame):
+    """analyze_frame の結果の各行から metric_values と同じ指標の値の辞書を取り出し、リストで返す"""
+    names = list(LEADERBOARD_METRICS)
+    return [
+        {metric: value for metric, value in zip(names, row) if value > 0}
+        for row in frame[names].to_numpy().tolist()
+    ]
+
+
+class RankIndex:
+    """1つの指標について、(-値, SteamID) を昇順に保つ順位インデックス
+
+    同じ値のプレイヤーは同じ順位になり、次の順位はその人数分だけ飛ぶ（1, 2, 2, 4 …）。
+    """
+
+    def __init__(self):
+        self._keys = []  # (-値, SteamID) の昇順
+        self._values = {}  # SteamID → 値
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, steam_id, value):
+        """プレイヤーの値を更新する（None で削除）。変化があれば True"""
+        old = self._values.get(steam_id)
+        if old == value:
+            return False
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, steam_id))]
+            del self._values[steam_id]
+        if value is not None:
+            insort(self._keys, (-value, steam_id))
+            self._values[steam_id] = value
+        return True
+
+    def rank(self, steam_id):
+        """プレイヤーの (順位, 値) を返す。ランキングにいなければ None"""
+        value = self._values.get(steam_id)
+        if value is None:
+            return None
+        # (-値,) は同じ値の (-値, SteamID) より前に並ぶので、自分より大きい値の件数が求まる
+        return bisect_left(self._keys, (-value,)) + 1, value
+
+    def top(self, n):
+        """上位 n 件を (順位, SteamID, 値) のリストで返す"""
+        entries = []
+        for position, (negated, steam_id) in enumerate(self._keys[:n]):
+            rank = entries[-1][0] if entries and -negated == entries[-1][2] else position + 1
+            entries.append((rank, steam_id, -negated))
+        return entries
+
+    def around(self, steam_id, radius=2):
+        """プレイヤーの前後 radius 件を含む (順位, SteamID, 値) のリストを返す。ランキングにいなければ空"""
+        value = self._values.get(steam_id)
+        if value is None:
+            return []
+        position = bisect_left(self._keys, (-value, steam_id))
+        start = max(0, position - radius)
+        entries = []
+        for negated, other in self._keys[start:position + radius + 1]:
+            rank = bisect_left(self._keys, (negated,)) + 1
+            entries.append((rank, other, -negated))
+        return entries
+
+
+class Leaderboard:
+    """1つのゲームについて、全指標の RankIndex と各プレイヤーの反映済みの時刻を持つ"""
+
+    def __init__(self, app_id, store=history_store, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.app_id = app_id
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.indexes = {metric: RankIndex() for metric in LEADERBOARD_METRICS}
+        self._seen = {}  # SteamID → 反映済みのスナップショットの最終確認時刻
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def update(self, steam_id, analysis, seen_at=None):
+        """プレイヤーの分析結果を全指標に反映し、順位の変わりうる指標の数を返す"""
+        return self.update_values(steam_id, metric_values(analysis), seen_at=seen_at)
+
+    def update_values(self, steam_id, values, seen_at=None):
+        """metric_values の形の指標の値を全指標に反映し、順位の変わりうる指標の数を返す"""
+        with self._lock:
+            changed = sum(index.update(steam_id, values.get(metric)) for metric, index in self.indexes.items())
+            self._seen[steam_id] = seen_at if seen_at is not None else time.time()
+        return changed
+
+    def remove(self, steam_id):
+        """プレイヤーをすべての指標から外す"""
+        with self._lock:
+            for index in self.indexes.values():
+                index.update(steam_id, None)
+            self._seen.pop(steam_id, None)
+
+    @metrics.timed("leaderboard.refresh")
+    def refresh(self, force=False):
+        """前回から更新されたプレイヤーだけを履歴ストアから読み直して反映し、その人数を返す
+
+        force=False の場合、前回の確認から refresh_interval 秒以内なら何もしない。
+        """
+        now = time.time()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return 0
+        self._refreshed_at = now
+
+        players = self.store.players(self.app_id)
+        stale = [(steam_id, seen_at) for steam_id, seen_at in players.items() if self._seen.get(steam_id) != seen_at]
+        latest = self.store.latest_many([steam_id for steam_id, _ in stale], self.app_id) if stale else {}
+        snapshots = [(steam_id, seen_at, latest[steam_id]) for steam_id, seen_at in stale if steam_id in latest]
+        if len(snapshots) >= BATCH_MIN_PLAYERS:
+            values_list = frame_metric_values(analyze_frame([snapshot.stats for _, _, snapshot in snapshots]))
+        else:
+            values_list = [metric_values(analyze_kf2_stats(snapshot.stats)) for _, _, snapshot in snapshots]
+        for (steam_id, seen_at, _), values in zip(snapshots, values_list):
+            self.update_values(steam_id, values, seen_at=seen_at)
+        metrics.incr("leaderboard.reloaded", len(snapshots))
+        return len(snapshots)
+
+    def top(self, metric, n=10):
+        """指標の上位 n 件を (順位, SteamID, 値) のリストで返す"""
+        with self._lock:
+            return self.indexes[metric].top(n)
+
+    def rank(self, metric, steam_id):
+        """プレイヤーの (順位, 値, ランキングの人数) を返す。その指標のランキングにいなければ None"""
+        with self._lock:
+            index = self.indexes[metric]
+            result = index.rank(steam_id)
+            return None if result is None else (*result, len(index))
+
+    def around(self, metric, steam_id, radius=2):
+        """プレイヤーの前後 radius 件を (順位, SteamID, 値) のリストで返す"""
+        with self._lock:
+            return self.indexes[metric].around(steam_id, radius)
+
+
+_leaderboards = {}
+_leaderboards_lock = threading.Lock()
+
+
+def get_leaderboard(app_id):
+    """プロセス全体で共有するゲームごとの Leaderboard を返す（初回は空なので refresh() してから使う）"""
+    with _leaderboards_lock:
+        if app_id not in _leaderboards:
+            _leaderboards[app_id] = Leaderboard(app_id)
+        return _leaderboards[app_id]
+
+
+def main(argv=None):
+    """履歴ストアの全プレイヤーから指標のランキングを表示する"""
+    parser = argparse.ArgumentParser(prog="python -m kf2core.leaderboard", description="保存済みの戦績のランキング")
+    parser.add_argument("metric", nargs="?", choices=list(LEADERBOARD_METRICS), metavar="metric", help="指標（省略すると一覧を表示）")
+    parser.add_argument("--app-id", type=int, default=232090)
+    parser.add_argument("-n", "--top", type=int, default=10, help="表示する上位の人数")
+    parser.add_argument("--steam-id", help="このプレイヤーの順位と前後の人も表示する")
+    args = parser.parse_args(argv)
+
+    if args.metric is None:
+        for metric, label in LEADERBOARD_METRICS.items():
+            print(f"{metric:<32} {label}")
+        return
+
+    leaderboard = get_leaderboard(args.app_id)
+    leaderboard.refresh(force=True)
+    print(f"{LEADERBOARD_METRICS[args.metric]}（{len(leaderboard.indexes[args.metric])} / {len(leaderboard)} 人）")
+    for rank, steam_id, value in leaderboard.top(args.metric, args.top):
+        print(f"{rank:>5}  {steam_id}  {value:,}")
+    if args.steam_id:
+        result = leaderboard.rank(args.metric, args.steam_id)
+        if result is None:
+            print(f"\n{args.steam_id} はこの指標のランキングにいません")
+        else:
+            print(f"\n{args.steam_id}: {result[0]} 位 / {result[2]} 人")
+            for rank, steam_id, value in leaderboard.around(args.metric, args.steam_id):
+                print(f"{rank:>5}  {steam_id}  {value:,}{'  ←' if steam_id == args.steam_id else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""処理段階ごとの所要時間とカウンターをプロセス内で集計する計測レイヤー
+
+取得（fetch.*）・JSONの読み込み（decode.*）・分析（analyze.*）・描画（render.*）などの
+段階ごとに回数・合計・直近の所要時間を記録し、通信量やリトライ回数などのカウンターと、
+kf2core.cache のヒット率と合わせて、Prometheus のテキスト形式や JSON Lines で書き出せる。
+"""
+
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .cache import cache_stats
+
+# 段階ごとに p50 / p95 の計算に使う直近の計測数
+RECENT_SAMPLES = 256
+
+PROMETHEUS_PREFIX = "kf2_"
+
+
+def percentile(values, q):
+    """線形補間のパーセンタイル（q は 0〜1）"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class StageStats:
+    """1つの段階の所要時間（秒）の集計"""
+
+    __slots__ = ("count", "total", "max", "last", "recent")
+
+    def __init__(self, recent=RECENT_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        """ミリ秒単位の集計を返す"""
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "last_ms": self.last * 1000,
+            "p50_ms": percentile(self.recent, 0.5) * 1000,
+            "p95_ms": percentile(self.recent, 0.95) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics:
+    """スレッドセーフな段階別タイマーとカウンターの集まり"""
+
+    def __init__(self, recent=RECENT_SAMPLES):
+        self.recent = recent
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """段階の所要時間（秒）を1件記録する"""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(self.recent)
+            stats.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """with ブロックの所要時間を段階として記録する（例外で抜けた場合も記録する）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """関数の呼び出しごとの所要時間を段階として記録するデコレーター"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def incr(self, name, value=1):
+        """カウンターを増やす"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        """段階とカウンターの集計を消す（キャッシュのヒット数は kf2core.cache 側で保持する）"""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """現在の集計を {"stages", "counters", "caches"} の辞書で返す"""
+        with self._lock:
+            stages = {stage: stats.summary() for stage, stats in sorted(self._stages.items())}
+            counters = dict(sorted(self._counters.items()))
+        return {"stages": stages, "counters": counters, "caches": cache_stats()}
+
+    def to_prometheus(self):
+        """Prometheus のテキスト形式で書き出す"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}stage_seconds 処理段階ごとの所要時間",
+            f"# TYPE {PROMETHEUS_PREFIX}stage_seconds summary",
+        ]
+        for stage, summary in snapshot["stages"].items():
+            label = f'stage="{stage}"'
+            lines.append(f'{PROMETHEUS_PREFIX}stage_seconds{{{label},quantile="0.5"}} {summary["p50_ms"] / 1000:.6f}')
+            lines.append(f'{PROMETHEUS_PREFIX}stage_seconds{{{label},quantile="0.95"}} {summary["p95_ms"] / 1000:.6f}')
+            lines.append(f"{PROMETHEUS_PREFIX}stage_seconds_sum{{{label}}} {summary['total_ms'] / 1000:.6f}")
+            lines.append(f"{PROMETHEUS_PREFIX}stage_seconds_count{{{label}}} {summary['count']}")
+
+        for name, value in snapshot["counters"].items():
+            metric = PROMETHEUS_PREFIX + name.replace(".", "_") + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        for field, name, kind in (("hits", "cache_hits_total", "counter"), ("misses", "cache_misses_total", "counter"),
+                                  ("size", "cache_entries", "gauge")):
+            metric = PROMETHEUS_PREFIX + name
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache_name, stats in snapshot["caches"].items():
+                lines.append(f'{metric}{{cache="{cache_name}"}} {stats[field]}')
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self, timestamp=None):
+        """段階・カウンター・キャッシュごとに1行のJSONで書き出す"""
+        timestamp = time.time() if timestamp is None else timestamp
+        snapshot = self.snapshot()
+        records = [{"time": timestamp, "type": "stage", "name": stage, **summary} for stage, summary in snapshot["stages"].items()]
+        records += [{"time": timestamp, "type": "counter", "name": name, "value": value} for name, value in snapshot["counters"].items()]
+        records += [{"time": timestamp, "type": "cache", "name": name, **stats} for name, stats in snapshot["caches"].items()]
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    def write_jsonl(self, path):
+        """現在の集計を JSON Lines ファイルに追記する"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_jsonl())
+
+
+# プロセス全体で共有する計測値
+metrics = Metrics()
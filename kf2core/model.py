@@ -0,0 +1,67 @@
+"""simple.py / colorful.py とポーラーが共有するデータモデル
+
+いずれも NamedTuple（__slots__ = () のタプル）なので属性を書き換えられず、インスタンスごとの
+__dict__ も持たない。プロセス内のキャッシュに入れた同じオブジェクトを、複数のセッションや
+両方の画面でそのまま共有できる（中の dict / list は読み取り専用として扱うこと）。
+"""
+
+import hashlib
+import json
+from typing import NamedTuple
+
+
+class GameSchema(NamedTuple):
+    """GetSchemaForGameを解析したスキーマ情報"""
+    stats: dict  # 統計名 → 表示名
+    achievements: dict  # 実績API名 → {displayName, description, icon, icongray}
+    total_achievements: int
+
+
+class PlayerSnapshot(NamedTuple):
+    """ある時点のプレイヤーの戦績"""
+    steam_id: str
+    app_id: int
+    fetched_at: float
+    stats: dict  # 統計名 → 値（get_stat_value と同じ形式）
+    achievements: list  # GetUserStatsForGame の achievements
+    playtime_minutes: int | None
+    checked_at: float | None = None  # 同じ内容を最後に確認した時刻
+
+    def content_hash(self):
+        """統計・実績・プレイ時間から計算した内容のハッシュ（取得時刻は含めない）"""
+        payload = json.dumps([self.stats, self.achievements, self.playtime_minutes], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PerkInfo(NamedTuple):
+    """1つのPerkのレベルと進捗"""
+    name: str
+    level: int
+    xp: int
+    progress_percent: float
+    next_level_xp: int
+    is_max: bool
+
+
+def perk_infos(analysis):
+    """analyze_kf2_stats の結果からXPのあるPerkの PerkInfo をタプルで返す（グラフのキャッシュキーにも使える）"""
+    return tuple(
+        PerkInfo(
+            name=perk_name,
+            level=perk["level"],
+            xp=perk["xp"],
+            progress_percent=perk["progress_percent"],
+            next_level_xp=perk["next_level_xp"],
+            is_max=perk["is_max"],
+        )
+        for perk_name, perk in analysis.get("perks", {}).items()
+    )
+
+
+class ProgressRate(NamedTuple):
+    """1つの指標の増えるペース（kf2core.progress の集計から求めたもの）"""
+    metric: str
+    value: float  # 最後に保存した値
+    per_play_hour: float | None  # プレイ時間1時間あたりの増加量（プレイ時間の増加が記録されていなければ None）
+    per_day: float | None  # 実時間1日あたりの増加量（遊んでいない日も含む）
+    since: float  # 集計を始めた時刻
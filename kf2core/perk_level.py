@@ -0,0 +1,76 @@
+"""経験値からPerkのレベル・進捗・次のレベルまでの必要XPを求める
+
+CUMULATIVE_XP_PER_LEVEL は昇順なので、線形に走査せず二分探索でレベルを求める。
+各レベルの必要XP幅は最初に1回だけ計算しておく。配列版はXPのベクトルを
+np.searchsorted でまとめて処理する（numpy は配列版を呼んだ時にだけ読み込む）。
+
+プレステージは扱わない。Steam の統計にはプレステージの段階がなく、最大レベルを超えた
+経験値もプレステージしたかどうかを表さないため、XPからは求められない。最大レベル以上の
+XPは常に Lv.25（進捗100%）として返す。
+"""
+
+import functools
+from bisect import bisect_right
+
+from .constants import CUMULATIVE_XP_PER_LEVEL, MAX_PERK_LEVEL
+
+# 最大レベルに必要な累計XP
+MAX_LEVEL_XP = CUMULATIVE_XP_PER_LEVEL[-1]
+
+# レベル i から i+1 に上がるのに必要なXP
+LEVEL_XP_SPANS = [
+    upper - lower for lower, upper in zip(CUMULATIVE_XP_PER_LEVEL, CUMULATIVE_XP_PER_LEVEL[1:])
+]
+
+
+@functools.cache
+def _xp_table():
+    """np.searchsorted 用の累計XP表"""
+    import numpy as np
+
+    return np.asarray(CUMULATIVE_XP_PER_LEVEL, dtype=np.int64)
+
+
+def calculate_perk_level_info(xp):
+    """総経験値(XP)からPerkのレベル、進捗、次のレベルまでの必要XPを計算する"""
+    if xp >= MAX_LEVEL_XP:
+        return MAX_PERK_LEVEL, 100.0, 0
+
+    # xp 未満になる最初のテーブル位置（最大レベル未満なので末尾を超えない）
+    upper = bisect_right(CUMULATIVE_XP_PER_LEVEL, xp)
+    if upper == 0:
+        # 負のXPはレベル0・進捗100%として扱う（従来の線形探索と同じ結果）
+        return 0, 100.0, -xp
+
+    level = upper - 1
+    progress_percent = ((xp - CUMULATIVE_XP_PER_LEVEL[level]) / LEVEL_XP_SPANS[level]) * 100
+    return level, progress_percent, CUMULATIVE_XP_PER_LEVEL[upper] - xp
+
+
+def calculate_perk_level_arrays(xp):
+    """calculate_perk_level_info の配列版。(level, progress_percent, next_level_xp) の配列を返す"""
+    import numpy as np
+
+    xp_table = _xp_table()
+    xp = np.asarray(xp, dtype=np.int64)
+    last = len(xp_table) - 1
+
+    upper = np.minimum(np.searchsorted(xp_table, xp, side="right"), last)
+    level = np.maximum(upper - 1, 0)
+    required_xp = xp_table[upper]
+    xp_for_current_level = xp_table[level]
+    needed_for_levelup = required_xp - xp_for_current_level
+    with np.errstate(divide="ignore", invalid="ignore"):
+        progress_percent = np.where(
+            needed_for_levelup == 0,
+            100.0,
+            ((xp - xp_for_current_level) / needed_for_levelup) * 100,
+        )
+
+    is_capped = xp >= MAX_LEVEL_XP
+    return (
+        np.where(is_capped, MAX_PERK_LEVEL, level),
+        np.where(is_capped, 100.0, progress_percent),
+        np.where(is_capped, 0, required_xp - xp),
+    )
+
@@ -0,0 +1,220 @@
+"""監視対象プレイヤーの戦績を定期取得して履歴ストアに保存する常駐ポーラー
+
+使い方:
+    $ STEAM_API_KEY=<APIキー> python -m kf2core.poller roster.txt
+
+roster.txt には64ビットSteam IDを1行に1つ書く（# 以降はコメント）。
+全プレイヤーで1つのトークンバケットを共有してAPI呼び出し数を制限し、
+最後に更新してから最も時間が経ったプレイヤーから順に取得する。呼び出しは kf2core.scheduler を
+BACKGROUND の優先度で通すため、画面と同じAPIキーを使っていても、台帳上の呼び出し数が上限の
+--quota-ratio に達した日はそれ以上取得しない。
+UIは「保存データから表示」でここで保存した戦績を読み出す。
+"""
+
+import argparse
+import heapq
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from .history import history_store
+from .metrics import metrics
+from .roster import load_roster
+from .scheduler import (
+    BACKGROUND, BACKGROUND_QUOTA_RATIO, DEFAULT_DAILY_QUOTA, RequestScheduler, quota_ledger, request_scheduler,
+)
+from .steam_api import fetch_player_playtime, fetch_player_snapshot
+
+logger = logging.getLogger(__name__)
+
+# 上限に対して実際に使う割合（UIからの呼び出し分を残しておく）
+QUOTA_SAFETY_RATIO = BACKGROUND_QUOTA_RATIO
+
+# 1人を再取得するまでの最短間隔（秒）
+DEFAULT_POLL_INTERVAL_SECONDS = 15 * 60
+
+# 1人あたりの最大の呼び出し数（戦績 + プレイ時間）。プレイ時間は appids_filter 付きの応答に
+# 対象のゲームがなければ全ゲーム一覧をもう1回取得するので、最大で2回になる
+# （トークンは RateLimitedClient が実際の呼び出しごとに消費するので、ここでは見積もりにだけ使う）
+CALLS_PER_PLAYER = 3
+
+# --metrics-file に計測値を追記する間隔（秒）
+METRICS_EXPORT_INTERVAL_SECONDS = 60
+
+
+class TokenBucket:
+    """スレッド間で共有するトークンバケット型のレートリミッター"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 1秒あたりに補充するトークン数
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1, stop_event=None):
+        """トークンが貯まるまで待ってから消費する。stop_event が立ったら False を返す"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class RateLimitedClient:
+    """SteamClient と同じ get() を持ち、呼び出しのたびにトークンを1つ消費するラッパー
+
+    プレイ時間の全ゲーム一覧の再取得のように、1人分の取得で呼び出す回数が変わっても
+    実際に送った回数だけトークンを消費する。
+    """
+
+    def __init__(self, client, bucket, stop_event=None):
+        self.client = client
+        self.bucket = bucket
+        self.stop_event = stop_event
+
+    def get(self, path, **kwargs):
+        if not self.bucket.acquire(stop_event=self.stop_event):
+            raise requests.exceptions.RequestException("ポーラーが停止しました")
+        return self.client.get(path, **kwargs)
+
+
+class Poller:
+    """監視対象を古い順に取得し続けるポーラー"""
+
+    def __init__(self, api_key, steam_ids, app_id, bucket, interval=DEFAULT_POLL_INTERVAL_SECONDS,
+                 workers=2, store=history_store, scheduler=request_scheduler, metrics_path=None):
+        self.api_key = api_key
+        self.metrics_path = metrics_path
+        self.app_id = app_id
+        self.interval = interval
+        self.workers = workers
+        self.store = store
+        self.stop_event = threading.Event()
+        self.client = RateLimitedClient(scheduler.client(BACKGROUND), bucket, self.stop_event)
+
+        # 保存済みの最終更新時刻で優先度キューを作る（未取得のプレイヤーが最優先）
+        last_updated = store.players(app_id)
+        self._queue = [(last_updated.get(steam_id, 0.0), steam_id) for steam_id in steam_ids]
+        heapq.heapify(self._queue)
+        self._queue_lock = threading.Lock()
+
+    def _next_player(self):
+        """次に取得すべきプレイヤーを取り出す。まだ期限前なら待つ"""
+        while not self.stop_event.is_set():
+            with self._queue_lock:
+                if self._queue:
+                    last_updated, steam_id = self._queue[0]
+                    wait = last_updated + self.interval - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self._queue)
+                        return steam_id
+                else:
+                    wait = 1.0
+            self.stop_event.wait(min(wait, 60.0))
+        return None
+
+    def _reschedule(self, steam_id, updated_at):
+        with self._queue_lock:
+            heapq.heappush(self._queue, (updated_at, steam_id))
+
+    def poll_player(self, steam_id):
+        """1人分の戦績とプレイ時間を取得して保存する。変化した統計の数を返す"""
+        snapshot = fetch_player_snapshot(self.api_key, steam_id, self.app_id, client=self.client)
+        if snapshot is None:
+            logger.warning("%s: 戦績を取得できませんでした（非公開プロフィールの可能性があります）", steam_id)
+            return 0
+        playtime_minutes = fetch_player_playtime(self.api_key, steam_id, self.app_id, client=self.client)
+        return self.store.record_snapshot(snapshot._replace(playtime_minutes=playtime_minutes))
+
+    def _worker(self):
+        while True:
+            steam_id = self._next_player()
+            if steam_id is None:
+                return
+            try:
+                changed = self.poll_player(steam_id)
+                logger.info("%s: %d 件の統計が更新されました", steam_id, changed)
+            except requests.exceptions.RequestException as e:
+                if self.stop_event.is_set():
+                    return
+                logger.warning("%s: 取得に失敗しました: %s", steam_id, e)
+            self._reschedule(steam_id, time.time())
+
+    def run(self):
+        """stop() が呼ばれるまで取得を続ける"""
+        threads = [threading.Thread(target=self._worker, name=f"poller-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        exported_at = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1.0)
+                if self.metrics_path and time.monotonic() - exported_at >= METRICS_EXPORT_INTERVAL_SECONDS:
+                    metrics.write_jsonl(self.metrics_path)
+                    exported_at = time.monotonic()
+        except KeyboardInterrupt:
+            logger.info("停止しています...")
+            self.stop()
+            for thread in threads:
+                thread.join()
+        if self.metrics_path:
+            metrics.write_jsonl(self.metrics_path)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m kf2core.poller", description="監視対象プレイヤーの戦績を定期取得する")
+    parser.add_argument("roster", help="64ビットSteam IDを1行に1つ書いたファイル")
+    parser.add_argument("--api-key", default=os.environ.get("STEAM_API_KEY"), help="Steam APIキー（既定: 環境変数 STEAM_API_KEY）")
+    parser.add_argument("--app-id", type=int, default=232090)
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL_SECONDS, help="1人を再取得するまでの最短間隔（秒）")
+    parser.add_argument("--daily-quota", type=int, default=DEFAULT_DAILY_QUOTA, help="APIキーの1日あたりの呼び出し上限")
+    parser.add_argument("--quota-ratio", type=float, default=QUOTA_SAFETY_RATIO, help="上限のうちポーラーが使う割合")
+    parser.add_argument("--burst", type=int, default=10, help="一度に連続して送れる呼び出し数")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--metrics-file", help=f"計測値を {METRICS_EXPORT_INTERVAL_SECONDS} 秒ごとに JSON Lines で追記するファイル")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("--api-key または環境変数 STEAM_API_KEY が必要です")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    steam_ids = load_roster(args.roster)
+    rate = args.daily_quota * args.quota_ratio / (24 * 60 * 60)
+    bucket = TokenBucket(rate=rate, capacity=args.burst)
+    logger.info(
+        "%d 人を監視します（%.2f 回/秒、1人あたり最短 %d 秒ごと）",
+        len(steam_ids), rate, args.interval,
+    )
+    if len(steam_ids) * CALLS_PER_PLAYER / args.interval > rate:
+        logger.warning("呼び出し上限のため、各プレイヤーの更新間隔は --interval より長くなります")
+
+    scheduler = RequestScheduler(quota_ledger, daily_quota=args.daily_quota, background_ratio=args.quota_ratio)
+    Poller(
+        args.api_key, steam_ids, args.app_id, bucket,
+        interval=args.interval, workers=args.workers, scheduler=scheduler, metrics_path=args.metrics_file,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""戦績の履歴から、XP・キル数・勝利数・実績の増えるペースと到達予測（ETA）を求める
+
+ペースは履歴全体を読み直さずに、スナップショットを保存するたびに指標ごとの集計を1行ずつ
+更新して求める（1回の更新は指標の数だけで、履歴の長さによらない）。集計は増加量と経過時間の
+合計で、半減期ごとに重みが半分になるため直近のペースを重く見る。ペースはプレイ時間1時間
+あたり（GetOwnedGames のプレイ時間が増えた分）と、実時間1日あたり（遊んでいない日も含む）の
+2通りで求める。集計表は kf2core.history の履歴ストアと同じデータベースに置く。
+"""
+
+import math
+import time
+
+from .analysis import analyze_kf2_stats
+from .model import ProgressRate
+from .perk_level import MAX_LEVEL_XP
+
+# プレイ時間あたりのペースの半減期（プレイ時間）
+PLAY_HALF_LIFE_HOURS = 20.0
+
+# 1日あたりのペースの半減期（日）
+WALL_HALF_LIFE_DAYS = 14.0
+
+# 実績の解除率の目標（%）
+ACHIEVEMENT_GOALS = (25, 50, 75, 90, 100)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+PROGRESS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS progress (
+    steam_id TEXT NOT NULL,
+    app_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    first_at REAL NOT NULL,
+    first_value REAL NOT NULL,
+    last_at REAL NOT NULL,  -- 最後に保存したスナップショットの取得時刻と値
+    last_value REAL NOT NULL,
+    play_value REAL,  -- 最後にプレイ時間が増えた時点の値と、その時のプレイ時間（分）
+    playtime_minutes INTEGER,
+    play_gain REAL NOT NULL DEFAULT 0,  -- 減衰付きの増加量と経過プレイ時間（時間）
+    play_hours REAL NOT NULL DEFAULT 0,
+    wall_gain REAL NOT NULL DEFAULT 0,  -- 減衰付きの増加量と経過日数
+    wall_days REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (steam_id, app_id, metric)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = (
+    "metric", "first_at", "first_value", "last_at", "last_value", "play_value", "playtime_minutes",
+    "play_gain", "play_hours", "wall_gain", "wall_days",
+)
+
+
+def progress_values(stats, achievements):
+    """ペースを集計する指標の値（PerkごとのXP・キル数・勝利数・解除済みの実績数）を返す"""
+    analysis = analyze_kf2_stats(stats)
+    values = {f"perks.{perk_name}.xp": perk["xp"] for perk_name, perk in analysis["perks"].items()}
+    values.update({f"kills.{name}": value for name, value in analysis["kills"].items()})
+    values["special_stats.match_wins"] = analysis["special_stats"]["match_wins"]
+    values["achievements.unlocked"] = len(achievements)
+    return values
+
+
+def update_progress(conn, steam_id, app_id, fetched_at, values, playtime_minutes=None):
+    """新しいスナップショットの指標の値で集計を1行ずつ更新する（呼び出し側のトランザクション内で実行する）"""
+    rows = {
+        row[0]: row for row in conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM progress WHERE steam_id = ? AND app_id = ?", (steam_id, app_id)
+        )
+    }
+    updated = []
+    for metric, value in values.items():
+        row = rows.get(metric)
+        if row is None:
+            updated.append((metric, fetched_at, value, fetched_at, value,
+                            value if playtime_minutes is not None else None, playtime_minutes, 0.0, 0.0, 0.0, 0.0))
+            continue
+        _, first_at, first_value, last_at, last_value, play_value, played, play_gain, play_hours, wall_gain, wall_days = row
+
+        # プレイ時間は統計より遅れて反映されることがあるので、プレイ時間が増えた時にまとめて数える
+        if playtime_minutes is not None and (played is None or playtime_minutes > played):
+            if played is not None:
+                hours = (playtime_minutes - played) / 60
+                decay = 0.5 ** (hours / PLAY_HALF_LIFE_HOURS)
+                play_gain = play_gain * decay + max(0, value - play_value)
+                play_hours = play_hours * decay + hours
+            play_value, played = value, playtime_minutes
+
+        days = max(0.0, (fetched_at - last_at) / SECONDS_PER_DAY)
+        decay = 0.5 ** (days / WALL_HALF_LIFE_DAYS)
+        wall_gain = wall_gain * decay + max(0, value - last_value)
+        wall_days = wall_days * decay + days
+
+        updated.append((metric, first_at, first_value, max(fetched_at, last_at), value,
+                        play_value, played, play_gain, play_hours, wall_gain, wall_days))
+
+    conn.executemany(
+        f"INSERT OR REPLACE INTO progress (steam_id, app_id, {', '.join(_COLUMNS)})"
+        f" VALUES (?, ?, {', '.join('?' * len(_COLUMNS))})",
+        [(steam_id, app_id, *row) for row in updated],
+    )
+
+
+def load_progress(conn, steam_id, app_id, now=None):
+    """プレイヤーの 指標 → ProgressRate を返す（集計がなければ空）"""
+    now = time.time() if now is None else now
+    rates = {}
+    for row in conn.execute(
+        f"SELECT {', '.join(_COLUMNS)} FROM progress WHERE steam_id = ? AND app_id = ?", (steam_id, app_id)
+    ):
+        metric, first_at, _, last_at, last_value, _, _, play_gain, play_hours, wall_gain, wall_days = row
+        # 最後に保存してから今までの、増えていない時間も1日あたりのペースに含める
+        idle_days = max(0.0, (now - last_at) / SECONDS_PER_DAY)
+        decay = 0.5 ** (idle_days / WALL_HALF_LIFE_DAYS)
+        wall_days = wall_days * decay + idle_days
+        rates[metric] = ProgressRate(
+            metric=metric,
+            value=last_value,
+            per_play_hour=play_gain / play_hours if play_hours > 0 else None,
+            per_day=wall_gain * decay / wall_days if wall_days > 0 else None,
+            since=first_at,
+        )
+    return rates
+
+
+def time_to_reach(remaining, rate):
+    """残り remaining を rate のペースで埋めるのにかかる時間（rate の単位）。到達済みなら 0、ペースがなければ None"""
+    if remaining <= 0:
+        return 0.0
+    if not rate or rate <= 0:
+        return None
+    return remaining / rate
+
+
+def perk_forecast(analysis, rates):
+    """XPのあるPerkごとに、ペースと次のレベル・最大レベルまでの予測時間の辞書を返す"""
+    forecast = []
+    for perk_name, perk in analysis["perks"].items():
+        rate = rates.get(f"perks.{perk_name}.xp")
+        per_play_hour = rate.per_play_hour if rate else None
+        per_day = rate.per_day if rate else None
+        to_max = 0 if perk["is_max"] else max(0, MAX_LEVEL_XP - perk["xp"])
+        forecast.append({
+            "perk": perk_name,
+            "level": perk["level"],
+            "xp_per_play_hour": per_play_hour,
+            "xp_per_day": per_day,
+            "next_level_xp": 0 if perk["is_max"] else perk["next_level_xp"],
+            "next_level_hours": time_to_reach(0 if perk["is_max"] else perk["next_level_xp"], per_play_hour),
+            "next_level_days": time_to_reach(0 if perk["is_max"] else perk["next_level_xp"], per_day),
+            "max_level_xp": to_max,
+            "max_level_hours": time_to_reach(to_max, per_play_hour),
+            "max_level_days": time_to_reach(to_max, per_day),
+        })
+    return forecast
+
+
+def achievement_forecast(unlocked, total, rate, goals=ACHIEVEMENT_GOALS):
+    """実績の解除率の目標ごとに、残りの実績数と予測時間の辞書を返す"""
+    forecast = []
+    if not total:
+        return forecast
+    per_play_hour = rate.per_play_hour if rate else None
+    per_day = rate.per_day if rate else None
+    for goal in goals:
+        remaining = max(0, math.ceil(total * goal / 100) - unlocked)
+        forecast.append({
+            "goal": goal,
+            "remaining": remaining,
+            "hours": time_to_reach(remaining, per_play_hour),
+            "days": time_to_reach(remaining, per_day),
+        })
+    return forecast
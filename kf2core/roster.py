@@ -0,0 +1,12 @@
+"""SteamIDを1行に1つ書いたロスターファイルの読み込み（ポーラー・エクスポートで共有する）"""
+
+
+def load_roster(path):
+    """ロスターファイルからSteamIDのリストを読み込む（重複・コメント・空行は除く）"""
+    steam_ids = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            steam_id = line.split("#", 1)[0].strip()
+            if steam_id and steam_id not in steam_ids:
+                steam_ids.append(steam_id)
+    return steam_ids
@@ -0,0 +1,270 @@
+"""Steam Web API の呼び出しを、APIキーごとの1日の上限（クォータ）の範囲で行うスケジューラー
+
+同じAPIキーを複数の利用者やポーラーで共有しても、1つの画面が上限を使い切らないよう、
+UI・ポーラー・エクスポートの呼び出しはすべてここを通す。
+
+- クォータ台帳: APIキー（のハッシュ）と日付（UTC）ごとの呼び出し数を SQLite に記録する。
+  Streamlit とポーラーなど複数のプロセスで同じ台帳を共有し、上限の確認と加算は1文で行う。
+- 優先度: 画面からの呼び出し (INTERACTIVE) は上限の INTERACTIVE_QUOTA_RATIO まで、
+  ポーラーやエクスポート・スキーマの事前取得 (BACKGROUND) は BACKGROUND_QUOTA_RATIO までしか使わない。
+  同時に送る数を超えた分は、優先度の高い順（同じ優先度なら到着順）に待つ。
+- 単一実行 (single-flight): 同じキーの取得が実行中なら、新しく送らずにその結果を待つ。
+
+上限に達した呼び出しは QuotaExceeded（RequestException のサブクラス）になるので、
+呼び出し側は通信エラーと同じく保存データやキャッシュで代用する。
+
+使い方:
+    $ STEAM_API_KEY=<APIキー> python -m kf2core.scheduler     # 本日の呼び出し数と残り
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import requests
+
+from .config import DEFAULT_CACHE_DIR
+from .metrics import metrics
+from .steam_client import steam_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTA_PATH = DEFAULT_CACHE_DIR / "quota.sqlite3"
+
+# Steam Web APIキーの1日あたりの呼び出し上限（環境変数 KF2_DAILY_QUOTA で変更可能）
+DEFAULT_DAILY_QUOTA = int(os.environ.get("KF2_DAILY_QUOTA", 100_000))
+
+# 優先度（小さいほど先に送る）
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# 上限のうち、各優先度の呼び出しが使える割合（残りは画面からの呼び出しのために空けておく）
+INTERACTIVE_QUOTA_RATIO = 0.95
+BACKGROUND_QUOTA_RATIO = 0.5
+
+# 1つのプロセスから同時に送る呼び出し数
+MAX_CONCURRENT_REQUESTS = 8
+
+# 台帳に残す日数
+LEDGER_RETENTION_DAYS = 7
+
+_LEDGER_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS quota_usage (
+    key_id TEXT NOT NULL,  -- APIキーのハッシュ（キーそのものは保存しない）
+    day TEXT NOT NULL,  -- UTCの日付
+    calls INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key_id, day)
+) WITHOUT ROWID;
+"""
+
+
+class QuotaExceeded(requests.exceptions.RequestException):
+    """APIキーのその日の呼び出し上限に達したため、呼び出しを送らなかった"""
+
+
+def key_id(api_key):
+    """台帳に記録するAPIキーの識別子（SHA-256の先頭16文字）"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def quota_day(at=None):
+    """呼び出し数を数える日付（UTC）"""
+    return time.strftime("%Y-%m-%d", time.gmtime(at))
+
+
+class QuotaLedger:
+    """APIキーと日付ごとの呼び出し数を記録する SQLite の台帳（複数のプロセスで共有できる）"""
+
+    def __init__(self, path=DEFAULT_QUOTA_PATH):
+        self.path = Path(path)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            with self._init_lock:
+                conn.execute("PRAGMA journal_mode = WAL")
+                with conn:
+                    conn.executescript(_LEDGER_SCHEMA_SQL)
+                    conn.execute(
+                        "DELETE FROM quota_usage WHERE day < ?",
+                        (quota_day(time.time() - LEDGER_RETENTION_DAYS * 24 * 60 * 60),),
+                    )
+                self._initialized = True
+        return conn
+
+    def try_charge(self, api_key, limit, calls=1, at=None):
+        """その日の呼び出し数に calls を加える。加えると limit を超える場合は加えずに False を返す"""
+        if calls > limit:
+            return False
+        conn = self._connect()
+        try:
+            with conn:
+                # 上限の確認と加算を1文で行うので、他のプロセスと同時に呼んでも上限を超えない
+                cursor = conn.execute(
+                    "INSERT INTO quota_usage (key_id, day, calls) VALUES (?, ?, ?)"
+                    " ON CONFLICT (key_id, day) DO UPDATE SET calls = calls + excluded.calls"
+                    " WHERE calls + excluded.calls <= ?",
+                    (key_id(api_key), quota_day(at), calls, limit),
+                )
+                return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def used(self, api_key, at=None):
+        """その日の呼び出し数を返す"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT calls FROM quota_usage WHERE key_id = ? AND day = ?", (key_id(api_key), quota_day(at))
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+
+class ScheduledClient:
+    """SteamClient と同じ get() を持ち、呼び出しを RequestScheduler に通すクライアント"""
+
+    def __init__(self, scheduler, priority):
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def get(self, path, params=None, **kwargs):
+        return self.scheduler.request(self.priority, path, params=params, **kwargs)
+
+
+class RequestScheduler:
+    """クォータ台帳・優先度付きの同時実行数制限・単一実行をまとめたスケジューラー"""
+
+    def __init__(self, ledger, daily_quota=DEFAULT_DAILY_QUOTA, interactive_ratio=INTERACTIVE_QUOTA_RATIO,
+                 background_ratio=BACKGROUND_QUOTA_RATIO, max_concurrent=MAX_CONCURRENT_REQUESTS, client=steam_client):
+        self.ledger = ledger
+        self.daily_quota = daily_quota
+        self.interactive_ratio = interactive_ratio
+        self.background_ratio = background_ratio
+        self.base_client = client
+        self._slots = max_concurrent
+        self._waiting = []  # (優先度, 到着順) のヒープ
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._inflight = {}  # 実行中の取得のキー → Future
+        self._inflight_lock = threading.Lock()
+
+    def limit(self, priority=INTERACTIVE):
+        """優先度ごとの1日の呼び出し数の上限"""
+        ratio = self.interactive_ratio if priority == INTERACTIVE else self.background_ratio
+        return int(self.daily_quota * ratio)
+
+    def remaining(self, api_key, priority=INTERACTIVE):
+        """その優先度で本日あと何回呼び出せるかを返す"""
+        return max(0, self.limit(priority) - self.ledger.used(api_key))
+
+    def client(self, priority=INTERACTIVE):
+        """この優先度で呼び出しを送る、SteamClient と同じ get() を持つクライアントを返す"""
+        return ScheduledClient(self, priority)
+
+    def _acquire(self, priority):
+        """空きができるまで、優先度の高い順に待つ"""
+        with self._condition:
+            entry = (priority, next(self._order))
+            heapq.heappush(self._waiting, entry)
+            self._condition.wait_for(lambda: self._slots > 0 and self._waiting[0] == entry)
+            heapq.heappop(self._waiting)
+            self._slots -= 1
+            # 空きが残っていれば次に待っている呼び出しも進める
+            self._condition.notify_all()
+
+    def _release(self):
+        with self._condition:
+            self._slots += 1
+            self._condition.notify_all()
+
+    def request(self, priority, path, params=None, **kwargs):
+        """1回の呼び出しを台帳に計上し、空きを待ってから送る
+
+        params の key（APIキー）ごとに数える（SteamClient 内の再試行は1回として数える）。
+        上限に達していれば送らずに QuotaExceeded を送出する。stream=True の場合、
+        同時実行数の枠はヘッダーを受信するまでで、本文の受信中は数えない。
+        """
+        api_key = (params or {}).get("key")
+        if api_key:
+            limit = self.limit(priority)
+            try:
+                allowed = self.ledger.try_charge(api_key, limit)
+            except (sqlite3.Error, OSError) as e:
+                # 台帳が使えなくても（保存先のフォルダーを作れない場合も含む）取得は止めない
+                logger.warning("クォータ台帳を更新できませんでした: %s", e)
+                allowed = True
+            if not allowed:
+                metrics.incr("scheduler.quota_exceeded")
+                raise QuotaExceeded(f"APIキーの本日の呼び出し上限（{limit:,} 回）に達したため、Steamへの問い合わせを控えました")
+
+        with metrics.timer("scheduler.wait"):
+            self._acquire(priority)
+        try:
+            return self.base_client.get(path, params=params, **kwargs)
+        finally:
+            self._release()
+
+    def run(self, key, func, *args, priority=INTERACTIVE, **kwargs):
+        """func(*args, client=この優先度のクライアント, **kwargs) を実行して結果を返す
+
+        同じ key の取得が実行中なら func を呼ばず、その結果（例外も含む）を共有する。
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            metrics.incr("scheduler.coalesced")
+            return future.result()
+
+        try:
+            result = func(*args, client=self.client(priority), **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+
+# プロセス全体で共有する台帳とスケジューラー
+quota_ledger = QuotaLedger()
+request_scheduler = RequestScheduler(quota_ledger)
+
+
+def main(argv=None):
+    """APIキーの本日の呼び出し数と、優先度ごとの残りを表示する"""
+    parser = argparse.ArgumentParser(prog="python -m kf2core.scheduler", description="Steam APIキーの呼び出し数の確認")
+    parser.add_argument("--api-key", default=os.environ.get("STEAM_API_KEY"), help="Steam APIキー（既定: 環境変数 STEAM_API_KEY）")
+    parser.add_argument("--daily-quota", type=int, default=DEFAULT_DAILY_QUOTA, help="APIキーの1日あたりの呼び出し上限")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("--api-key または環境変数 STEAM_API_KEY が必要です")
+
+    scheduler = RequestScheduler(quota_ledger, daily_quota=args.daily_quota)
+    print(f"{quota_day()}（UTC）の呼び出し数: {quota_ledger.used(args.api_key):,} / {args.daily_quota:,} 回")
+    for label, priority in (("画面から", INTERACTIVE), ("ポーラー・エクスポート", BACKGROUND)):
+        print(f"  {label}: あと {scheduler.remaining(args.api_key, priority):,} 回（上限 {scheduler.limit(priority):,} 回）")
+
+
+if __name__ == "__main__":
+    main()
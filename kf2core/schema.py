@@ -0,0 +1,214 @@
+"""GetSchemaForGame の取得・解析と、app_id ごとのディスクキャッシュ"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import requests
+
+from .config import DEFAULT_CACHE_DIR
+from .metrics import metrics
+from .model import GameSchema
+from .steam_client import decode_json, steam_client
+
+SCHEMA_PATH = "ISteamUserStats/GetSchemaForGame/v2/"
+
+# スキーマはほとんど変わらないため、1週間は再検証せずに使う
+SCHEMA_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+EMPTY_GAME_SCHEMA = GameSchema(stats={}, achievements={}, total_achievements=0)
+
+
+def parse_game_schema(data):
+    """GetSchemaForGameのレスポンスをGameSchemaに変換する"""
+    game_stats = data.get("game", {}).get("availableGameStats", {})
+
+    stats_schema = {stat["name"]: stat.get("displayName", stat["name"]) for stat in game_stats.get("stats", [])}
+
+    achievements_list = game_stats.get("achievements", [])
+    achievements_schema = {
+        ach["name"]: {
+            "displayName": ach.get("displayName", ach["name"]),
+            "description": ach.get("description", ""),
+            "icon": ach.get("icon", ""),
+            "icongray": ach.get("icongray", ""),
+        }
+        for ach in achievements_list
+    }
+
+    return GameSchema(
+        stats=stats_schema,
+        achievements=achievements_schema,
+        total_achievements=len(achievements_list),
+    )
+
+
+class CachedSchema(NamedTuple):
+    """ディスクに保存されたスキーマと再検証用のメタデータ"""
+    schema: GameSchema
+    fetched_at: float
+    etag: str = ""
+    last_modified: str = ""
+
+    def is_fresh(self, ttl=SCHEMA_CACHE_TTL_SECONDS):
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self):
+        """条件付きリクエスト用のヘッダーを返す"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class SchemaCache:
+    """app_id ごとに解析済みスキーマをJSONファイルとして保存するキャッシュ
+
+    一度読み込んだエントリはメモリにも保持し、Streamlitの再実行ではディスクも読まない。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir) / "schema"
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, app_id):
+        return self.cache_dir / f"{app_id}.json"
+
+    def load(self, app_id):
+        """キャッシュ済みのスキーマを返す。存在しなければ None"""
+        with self._lock:
+            if app_id in self._memory:
+                return self._memory[app_id]
+        try:
+            with open(self._path(app_id), encoding="utf-8") as f:
+                raw = json.load(f)
+            entry = CachedSchema(
+                schema=GameSchema(**raw["schema"]),
+                fetched_at=raw["fetched_at"],
+                etag=raw.get("etag", ""),
+                last_modified=raw.get("last_modified", ""),
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        with self._lock:
+            self._memory[app_id] = entry
+        return entry
+
+    def save(self, app_id, entry):
+        """スキーマをディスクとメモリに保存する"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        raw = {
+            "schema": entry.schema._asdict(),
+            "fetched_at": entry.fetched_at,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+        }
+        path = self._path(app_id)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(raw, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._memory[app_id] = entry
+
+    def purge(self, app_id=None):
+        """指定した app_id（省略時はすべて）のキャッシュを削除し、削除件数を返す"""
+        with self._lock:
+            if app_id is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(app_id, None)
+        paths = [self._path(app_id)] if app_id is not None else list(self.cache_dir.glob("*.json"))
+        removed = 0
+        for path in paths:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+# プロセス全体で共有するキャッシュ
+schema_cache = SchemaCache()
+
+
+def fetch_game_schema(api_key, app_id, cache=schema_cache, force=False, client=steam_client):
+    """キャッシュを優先してGameSchemaを返す
+
+    TTL内のキャッシュがあればそのまま返す。期限切れの場合は ETag / Last-Modified で
+    条件付きリクエストを送り、304 ならダウンロードせずにキャッシュを延長する。
+    通信エラー時は古いキャッシュがあればそれを使う。
+    """
+    cached = cache.load(app_id)
+    if cached and cached.is_fresh() and not force:
+        metrics.incr("schema.fresh")
+        return cached.schema
+
+    headers = cached.validators() if cached else {}
+    try:
+        response = client.get(SCHEMA_PATH, params={"key": api_key, "appid": app_id}, headers=headers)
+        if response.status_code == 304 and cached:
+            metrics.incr("schema.not_modified")
+            cache.save(app_id, cached._replace(fetched_at=time.time()))
+            return cached.schema
+        response.raise_for_status()
+        data = decode_json(response)
+        with metrics.timer("parse.schema"):
+            schema = parse_game_schema(data)
+    except requests.exceptions.RequestException:
+        if cached:
+            metrics.incr("schema.stale")
+            return cached.schema
+        raise
+
+    metrics.incr("schema.downloaded")
+    cache.save(app_id, CachedSchema(
+        schema=schema,
+        fetched_at=time.time(),
+        etag=response.headers.get("ETag", ""),
+        last_modified=response.headers.get("Last-Modified", ""),
+    ))
+    return schema
+
+
+def main(argv=None):
+    """スキーマキャッシュを事前取得 (warm) または削除 (purge) する"""
+    parser = argparse.ArgumentParser(prog="python -m kf2core.schema", description="KF2スキーマキャッシュの管理")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = subparsers.add_parser("warm", help="スキーマを取得してキャッシュに保存する")
+    warm_parser.add_argument("--api-key", default=os.environ.get("STEAM_API_KEY"), help="Steam APIキー（既定: 環境変数 STEAM_API_KEY）")
+    warm_parser.add_argument("--app-id", type=int, default=232090)
+
+    purge_parser = subparsers.add_parser("purge", help="キャッシュを削除する")
+    purge_parser.add_argument("--app-id", type=int, default=None, help="省略時はすべて削除")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        if not args.api_key:
+            parser.error("--api-key または環境変数 STEAM_API_KEY が必要です")
+        from .scheduler import BACKGROUND, QuotaExceeded, request_scheduler
+
+        # ポーラーやエクスポートと同じく、APIキーの呼び出し数を台帳に計上して上限の範囲で取得する
+        try:
+            schema = fetch_game_schema(args.api_key, args.app_id, force=True, client=request_scheduler.client(BACKGROUND))
+        except QuotaExceeded as e:
+            parser.exit(1, f"{e}\n")
+        print(f"app_id={args.app_id}: 統計 {len(schema.stats)} 件 / 実績 {schema.total_achievements} 件をキャッシュしました")
+    else:
+        removed = schema_cache.purge(args.app_id)
+        print(f"{removed} 件のキャッシュを削除しました")
+
+
+if __name__ == "__main__":
+    main()
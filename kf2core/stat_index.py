@@ -0,0 +1,89 @@
+"""分析で参照する統計IDを事前に並べたインデックスによる統計値の一括抽出
+
+analyze_kf2_stats が参照する統計IDは数十個しかないため、それらを1列ずつに割り当てた
+列インデックスを最初に1回だけ作っておく。1人分の統計は参照する列だけを1回の走査で
+取り出し、複数プレイヤー・複数スナップショットは (件数 × 参照統計) の2次元配列に詰めて、
+カテゴリごとの値を列スライスでまとめて扱う。
+numpy は2次元配列を扱う時にだけ読み込む（1人分の分析だけならCLIの起動が軽く済む）。
+"""
+
+STAT_NAME_PREFIX = "1_"
+
+
+def stat_name(stat_id):
+    """統計IDをAPIの統計名（"1_<ID>"）に変換する"""
+    return f"{STAT_NAME_PREFIX}{stat_id}"
+
+
+class StatIndex:
+    """カテゴリごとの 表示名 → 統計ID 表を列番号に展開した抽出用インデックス
+
+    categories は {カテゴリ名: {表示名: 統計ID}} の辞書。存在しない統計は 0 になる
+    （get_stat_value と同じ扱い）。同じ統計IDを複数のカテゴリが参照しても列は1つ。
+    """
+
+    def __init__(self, categories):
+        self.categories = {name: dict(mapping) for name, mapping in categories.items()}
+
+        # 統計ID → 列番号
+        self.columns = {}
+        for mapping in self.categories.values():
+            for stat_id in mapping.values():
+                self.columns.setdefault(stat_id, len(self.columns))
+        self.names = [stat_name(stat_id) for stat_id in self.columns]
+        self._name_to_column = {name: column for column, name in enumerate(self.names)}
+
+        # カテゴリ → (表示名リスト, 列番号リスト)
+        self._layout = {
+            name: (list(mapping), [self.columns[stat_id] for stat_id in mapping.values()])
+            for name, mapping in self.categories.items()
+        }
+
+    @property
+    def stat_ids(self):
+        """列順の統計IDの配列"""
+        import numpy as np
+
+        return np.fromiter(self.columns, dtype=np.int64, count=len(self.columns))
+
+    def row(self, stats):
+        """1人分の統計から参照する列の値だけをリストで返す
+
+        stats は stats_dict（名前 → 値）または playerstats["stats"]（{name, value} のリスト）。
+        """
+        if isinstance(stats, dict):
+            return [stats.get(name, 0) for name in self.names]
+        row = [0] * len(self.names)
+        name_to_column = self._name_to_column
+        for stat in stats:
+            column = name_to_column.get(stat["name"])
+            if column is not None:
+                row[column] = stat["value"]
+        return row
+
+    def matrix(self, stats_list):
+        """複数人分（または複数スナップショット）の統計を (件数 × 参照統計) の2次元配列にする"""
+        import numpy as np
+
+        matrix = np.zeros((len(stats_list), len(self.names)), dtype=np.int64)
+        for i, stats in enumerate(stats_list):
+            matrix[i] = self.row(stats)
+        return matrix
+
+    def extract(self, row):
+        """1人分の列の値を {カテゴリ: {表示名: 値}} に組み立てる"""
+        return {
+            name: {label: row[column] for label, column in zip(labels, columns)}
+            for name, (labels, columns) in self._layout.items()
+        }
+
+    def extract_matrix(self, matrix):
+        """2次元配列をカテゴリごとに切り出し、{カテゴリ: (表示名リスト, 件数×項目数の配列)} を返す"""
+        return {
+            name: (labels, matrix[:, columns])
+            for name, (labels, columns) in self._layout.items()
+        }
+
+    def column(self, matrix, category, label):
+        """2次元配列から1項目分の列を取り出す"""
+        return matrix[:, self.columns[self.categories[category][label]]]
@@ -0,0 +1,108 @@
+"""プレイヤー単位のSteam Web API呼び出し（UIに依存しない）
+
+失敗時は requests.exceptions.RequestException を送出する。エラー表示は呼び出し側で行う。
+fetch_player_playtime / fetch_player_snapshot は本文全体を読み込まず、kf2core.jsonstream で
+必要な値だけを逐次読み取る。
+"""
+
+import json
+import time
+
+import requests
+
+from .jsonstream import JSONStream
+from .metrics import metrics
+from .model import PlayerSnapshot
+from .steam_client import steam_client
+
+OWNED_GAMES_PATH = "IPlayerService/GetOwnedGames/v0001/"
+USER_STATS_PATH = "ISteamUserStats/GetUserStatsForGame/v0002/"
+
+
+def owned_games_params(api_key, steam_id, app_ids=None):
+    """GetOwnedGames のパラメーター。app_ids を渡すとそのゲームだけに絞って要求する"""
+    params = {"key": api_key, "steamid": steam_id, "format": "json"}
+    for i, app_id in enumerate(app_ids or []):
+        params[f"appids_filter[{i}]"] = app_id
+    return params
+
+
+def read_stream(response, parse, *args):
+    """stream=True のレスポンス本文を parse(JSONStream, *args) で逐次読む
+
+    壊れたJSONは response.json() と同じく requests.exceptions.JSONDecodeError
+    （RequestException のサブクラス）として送出する。
+    """
+    response.raise_for_status()
+    try:
+        return parse(JSONStream.from_response(response), *args)
+    except json.JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos) from e
+
+
+@metrics.timed("decode.owned_games_stream")
+def stream_owned_game_playtime(stream, app_id):
+    """GetOwnedGames の本文を逐次読み、app_id の総プレイ時間（分）を返す
+
+    見つかった時点で読むのをやめる。games が空か含まれない場合は None、
+    他のゲームしかない場合は 0 を返す。
+    """
+    if not stream.find("response", "games") or stream.peek() != "[":
+        return None
+    games = 0
+    for game in stream.values():
+        games += 1
+        if game.get("appid") == app_id:
+            return game.get("playtime_forever", 0)
+    return 0 if games else None
+
+
+def fetch_player_playtime(api_key, steam_id, app_id, client=steam_client):
+    """指定されたゲームの総プレイ時間（分）を取得する"""
+    # 数千本のゲームを持つアカウントでも小さなレスポンスで済むよう、対象ゲームだけを要求する
+    # フィルタが効かなかった場合のみ全ゲーム一覧から探す
+    for app_ids in ([app_id], None):
+        with client.get(OWNED_GAMES_PATH, params=owned_games_params(api_key, steam_id, app_ids), stream=True) as response:
+            playtime = read_stream(response, stream_owned_game_playtime, app_id)
+        if playtime is not None:
+            return playtime
+    return 0
+
+
+@metrics.timed("decode.user_stats_stream")
+def stream_player_stats(stream):
+    """GetUserStatsForGame の本文を逐次読み、(統計名 → 値 の辞書, 実績のリスト) を返す
+
+    統計は要素ごとの辞書を作らずに、名前と値を直接辞書に入れる。
+    統計が含まれない場合（非公開プロフィールなど）は None を返す。
+    """
+    if not stream.find("playerstats") or stream.peek() != "{":
+        return None
+    stats = None
+    achievements = []
+    for key in stream.keys():
+        if key == "stats":
+            stats = dict(stream.pairs("name", "value"))
+        elif key == "achievements":
+            achievements = stream.value()
+        else:
+            stream.skip()
+    return None if stats is None else (stats, achievements)
+
+
+def fetch_player_snapshot(api_key, steam_id, app_id, client=steam_client):
+    """戦績と実績を取得して PlayerSnapshot を返す（プレイ時間は含めない）。統計がなければ None"""
+    params = {"appid": app_id, "key": api_key, "steamid": steam_id}
+    with client.get(USER_STATS_PATH, params=params, stream=True) as response:
+        parsed = read_stream(response, stream_player_stats)
+    if parsed is None:
+        return None
+    stats, achievements = parsed
+    return PlayerSnapshot(
+        steam_id=steam_id,
+        app_id=app_id,
+        fetched_at=time.time(),
+        stats=stats,
+        achievements=achievements,
+        playtime_minutes=None,
+    )
@@ -0,0 +1,146 @@
+"""Steam Web API 用の共有HTTPクライアント（接続プール・タイムアウト・リトライ）"""
+
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+# 接続先（環境変数 KF2_STEAM_API_BASE_URL でベンチマーク用のスタブサーバーなどに変更可能）
+STEAM_API_BASE_URL = os.environ.get("KF2_STEAM_API_BASE_URL", "https://api.steampowered.com/")
+
+# (接続タイムアウト, 読み取りタイムアウト) 秒
+DEFAULT_TIMEOUT = (3.05, 15)
+
+# 429 / 5xx と接続エラーのリトライ設定
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 再試行を含めた1回の呼び出し全体の目安（秒）。超えそうなら再試行せずに最後の結果を返す
+RETRY_DEADLINE_SECONDS = 30.0
+
+# 同時に保持するkeep-alive接続数（並列取得のワーカー数以上にする）
+POOL_MAXSIZE = 16
+
+
+def parse_retry_after(value):
+    """Retry-After ヘッダー（秒数またはHTTP日付）を待機秒数に変換する"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_name(path):
+    """計測用にパスからAPIのメソッド名（例: GetUserStatsForGame）を取り出す"""
+    parts = [part for part in urlsplit(path).path.split("/") if part]
+    if len(parts) >= 2 and parts[-1][:1] == "v" and parts[-1][1:].isdigit():
+        return parts[-2]
+    return parts[-1] if parts else "unknown"
+
+
+def decode_json(response):
+    """レスポンス本文をJSONとして読み込む（所要時間を decode.json として記録する）"""
+    with metrics.timer("decode.json"):
+        return response.json()
+
+
+class SteamClient:
+    """keep-alive の Session を共有し、失敗時は指数バックオフ（ジッター付き）で再試行するクライアント"""
+
+    def __init__(self, base_url=STEAM_API_BASE_URL, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS, pool_maxsize=POOL_MAXSIZE,
+                 retry_deadline=RETRY_DEADLINE_SECONDS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_deadline = retry_deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self._session = self._create_session()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept"] = "application/json"
+        return session
+
+    def _backoff(self, attempt, retry_after=None):
+        """attempt 回目の再試行までの待機秒数（Retry-After があれば優先する）"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # フルジッター: 0 〜 base * 2^attempt の一様乱数
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, path, params=None, headers=None, timeout=None, stage=None, stream=False):
+        """GETリクエストを送る。path はベースURLからの相対パスまたは完全なURL
+
+        429 / 5xx と接続エラー（接続タイムアウトを含む）は max_retries 回まで再試行する。
+        読み取りタイムアウトはサーバーが処理中のことが多く、待ち直すとワーカーを長く占有するので再試行しない。
+        再試行の待ち時間と合わせて retry_deadline 秒を超えそうな場合も、それ以上は再試行しない。
+        最後のレスポンスをそのまま返すので、呼び出し側で raise_for_status() すること。
+        stage を省略すると計測の段階名は fetch.<APIのメソッド名> になる。
+        stream=True の場合は本文を読まずに返す（kf2core.jsonstream で読み、最後に close() すること）。
+        """
+        url = path if path.startswith(("http://", "https://")) else self.base_url + path
+        # リトライの待ち時間も含めた1回の呼び出し全体を計測する（stream=True では本文の受信は含まない）
+        with metrics.timer(stage or f"fetch.{endpoint_name(path)}"):
+            response = self._get_with_retry(url, params, headers, timeout or self.timeout, stream)
+            if not stream:
+                metrics.incr("http.bytes", len(response.content))
+        return response
+
+    def _within_deadline(self, started, delay):
+        """delay 秒待ってから再試行しても、呼び出し全体が retry_deadline 秒に収まりそうか"""
+        return time.monotonic() - started + delay < self.retry_deadline
+
+    def _get_with_retry(self, url, params, headers, timeout, stream=False):
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            metrics.incr("http.requests")
+            try:
+                response = self._session.get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+            except requests.exceptions.ConnectionError:
+                # ConnectTimeout は ConnectionError のサブクラス。ReadTimeout はここで捕まえずにそのまま送出する
+                metrics.incr("http.errors")
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or not self._within_deadline(started, delay):
+                    raise
+                metrics.incr("http.retries")
+                time.sleep(delay)
+                continue
+            except requests.exceptions.Timeout:
+                metrics.incr("http.errors")
+                raise
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response
+            delay = self._backoff(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            if not self._within_deadline(started, delay):
+                return response
+            metrics.incr("http.retries")
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        self._session.close()
+
+
+# プロセス全体で共有するクライアント
+steam_client = SteamClient()
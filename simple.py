@@ -6,80 +6,21 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 
-# --- 定数と設定 ---
+from kf2core.analysis import analyze_kf2_stats
+from kf2core.cache import memoize
+from kf2core.constants import GAME_APP_IDS, MAX_PERK_LEVEL, PERK_STAT_IDS
+from kf2core.frontend import (
+    REVALIDATE_POLL_SECONDS, collect_result, fetch_squad, finishes_soon, load_cached_schema, load_latest_snapshot,
+    load_progress, load_quota_usage, parse_steam_ids, poll_revalidation, save_snapshot, start_concurrent_fetch,
+)
+from kf2core.leaderboard import LEADERBOARD_METRICS, get_leaderboard
+from kf2core.metrics import metrics
+from kf2core.model import perk_infos
+from kf2core.progress import achievement_forecast, perk_forecast
+from kf2core.scheduler import request_scheduler
+from kf2core.schema import EMPTY_GAME_SCHEMA, fetch_game_schema, schema_cache
 
-# ゲーム名とSteam AppIDの対応表
-GAME_APP_IDS = {
-    "Killing Floor 2": 232090,
-}
-
-# Perkのレベルアップに必要な累計経験値のテーブル
-CUMULATIVE_XP_PER_LEVEL = [
-    0, 2640, 5557, 8781, 12343, 16279, 20628, 25434, 30745, 36613,
-    43097, 50262, 58180, 66929, 76596, 87279, 99083, 112127, 126540,
-    142467, 160066, 179513, 201002, 224747, 250985, 279978
-]
-
-# 最大レベルと必要ポイント
-MAX_PERK_LEVEL = 25
-MAX_PRESTIGE_LEVEL = 2
-WELDING_POINTS_REQUIRED = 510
-HEALING_POINTS_REQUIRED = 10
-KFMAX_PERKS = 10
-
-# KF2のPerk統計ID（APIデータより）
-PERK_STAT_IDS = {
-    "Commando": {"progress": 1, "build": 2},
-    "Berserker": {"progress": 10, "build": 11},
-    "Support": {"progress": 20, "build": 21, "weld": 22},
-    "Firebug": {"progress": 30, "build": 31},
-    "Field Medic": {"progress": 40, "build": 41, "heal": 42},
-    "Sharpshooter": {"progress": 50, "build": 51},
-    "Demolitionist": {"progress": 60, "build": 61},
-    "Survivalist": {"progress": 70, "build": 71},
-    "Gunslinger": {"progress": 80, "build": 81},
-    "SWAT": {"progress": 90, "build": 91},
-}
-
-# 各種統計マッピング
-KILL_STAT_IDS = {
-    "総キル数": 200,
-    "ストーカー討伐": 201,
-    "クローラー討伐": 202,
-    "フレッシュパウンド討伐": 203,
-}
-
-PERSONAL_BEST_IDS = {
-    "ナイフキル": 2000,
-    "ピストルキル": 2001,
-    "ヘッドショット": 2002,
-    "ヒール量": 2003,
-    "総キル": 2004,
-    "アシスト": 2005,
-    "大型ZED討伐": 2006,
-    "DOSH獲得": 2007,
-}
-
-ACHIEVEMENT_IDS = {
-    "MrPerky5": 4001,
-    "MrPerky10": 4002,
-    "MrPerky15": 4003,
-    "MrPerky20": 4004,
-    "MrPerky25": 4005,
-    "Hard勝利": 4015,
-    "Suicidal勝利": 4016,
-    "Hell勝利": 4017,
-    "VSZed勝利": 4009,
-    "VSHuman勝利": 4010,
-    "HoldOut": 4011,
-    "DieVolter": 4012,
-    "FleshPound討伐": 4013,
-    "Shrike討伐": 4014,
-    "Siren討伐": 4018,
-    "Benefactor": 4019,
-    "HealTeam": 4020,
-    "QuickOnTheTrigger": 4033,
-}
+# --- 定数と設定 ---
 
 # コレクティブル実績
 # COLLECTIBLE_ACHIEVEMENTS = {
@@ -109,171 +50,52 @@ ACHIEVEMENT_IDS = {
 #     "Monster Ball Secret": 4046,
 # }
 
-# --- データ取得関数 ---
-
-def get_player_playtime(api_key, steam_id, app_id):
-    """指定されたゲームの総プレイ時間（分）を取得する"""
-    try:
-        url = f"https://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/?key={api_key}&steamid={steam_id}&format=json"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json().get("response", {}).get("games", [])
-        for game in data:
-            if game["appid"] == app_id:
-                return game.get("playtime_forever", 0)
-        return 0
-    except requests.exceptions.RequestException as e:
-        st.error(f"プレイ時間取得中にAPIエラーが発生しました: {e}")
-        return 0
-
-def get_player_stats(api_key, steam_id, app_id):
-    """指定されたゲームの戦績と実績を取得する"""
-    try:
-        url = f"https://api.steampowered.com/ISteamUserStats/GetUserStatsForGame/v0002/?appid={app_id}&key={api_key}&steamid={steam_id}"
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json().get("playerstats")
-    except requests.exceptions.RequestException as e:
-        st.error(f"戦績データ取得中にAPIエラーが発生しました: {e}")
-        return None
-
-def get_total_achievements(api_key, app_id):
-    """ゲームの全実績数を取得する"""
-    try:
-        url = f"https://api.steampowered.com/ISteamUserStats/GetSchemaForGame/v2/?key={api_key}&appid={app_id}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        achievements_schema = data.get("game", {}).get("availableGameStats", {}).get("achievements", [])
-        return len(achievements_schema)
-    except requests.exceptions.RequestException as e:
-        st.error(f"全実績数の取得中にAPIエラーが発生しました: {e}")
-        return 0
-
-def get_game_schema(api_key, app_id):
-    """ゲームのスキーマ情報（統計、実績）を取得する"""
-    try:
-        url = f"https://api.steampowered.com/ISteamUserStats/GetSchemaForGame/v2/?key={api_key}&appid={app_id}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json().get("game", {}).get("availableGameStats", {})
-        
-        stats_schema = {stat["name"]: stat.get("displayName", stat["name"]) for stat in data.get("stats", [])}
-        
-        achievements_schema = {
-            ach["name"]: {
-                "displayName": ach.get("displayName", ach["name"]),
-                "description": ach.get("description", ""),
-                "icon": ach.get("icon", ""),
-            }
-            for ach in data.get("achievements", [])
-        }
-        
-        return {"stats": stats_schema, "achievements": achievements_schema}
-    except Exception as e:
-        st.error(f"ゲームスキーマの取得中にエラーが発生しました: {e}")
-        return {"stats": {}, "achievements": {}}
-
-# --- データ処理関数 ---
-
-def get_stat_value(stats_dict, stat_id):
-    """統計IDから値を取得する"""
-    return stats_dict.get(f"1_{stat_id}", 0)
-
-def calculate_perk_level_info(xp):
-    """総経験値(XP)からPerkのレベル、進捗、次のレベルまでの必要XPを計算する"""
-    if xp >= CUMULATIVE_XP_PER_LEVEL[-1]:
-        return 25, 100.0, 0
-
-    level = 0
-    for i, required_xp in enumerate(CUMULATIVE_XP_PER_LEVEL):
-        if xp < required_xp:
-            level = i - 1
-            if level < 0: 
-                level = 0
-            
-            xp_for_current_level = CUMULATIVE_XP_PER_LEVEL[level]
-            progress_in_level = xp - xp_for_current_level
-            needed_for_levelup = required_xp - xp_for_current_level
-            
-            if needed_for_levelup == 0:
-                progress_percent = 100.0
-            else:
-                progress_percent = (progress_in_level / needed_for_levelup) * 100
-            
-            return level, progress_percent, required_xp - xp
-            
-    return 0, 0.0, CUMULATIVE_XP_PER_LEVEL[1] - xp
+# --- UI表示関数 ---
 
-def analyze_kf2_stats(stats_dict):
-    """KF2統計データを詳細に分析する"""
-    analysis = {}
-    
-    # Perkデータの分析
-    perks = {}
-    for perk_name, ids in PERK_STAT_IDS.items():
-        progress_xp = get_stat_value(stats_dict, ids["progress"])
-        build_xp = get_stat_value(stats_dict, ids["build"])
-        
-        if progress_xp > 0 or build_xp > 0:
-            # 進捗XPが主要な値のようだ
-            total_xp = progress_xp if progress_xp > 0 else build_xp
-            level, progress_percent, next_level_xp = calculate_perk_level_info(total_xp)
-            
-            perks[perk_name] = {
-                "level": level,
-                "xp": total_xp,
-                "progress_percent": progress_percent,
-                "next_level_xp": next_level_xp,
-                "is_max": level >= MAX_PERK_LEVEL
-            }
-            
-            # 特別な統計
-            if perk_name == "Support" and "weld" in ids:
-                perks[perk_name]["weld_points"] = get_stat_value(stats_dict, ids["weld"])
-            elif perk_name == "Field Medic" and "heal" in ids:
-                perks[perk_name]["heal_points"] = get_stat_value(stats_dict, ids["heal"])
-    
-    analysis["perks"] = perks
-    
-    # キル統計
-    kills = {}
-    for kill_name, stat_id in KILL_STAT_IDS.items():
-        kills[kill_name] = get_stat_value(stats_dict, stat_id)
-    analysis["kills"] = kills
-    
-    # パーソナルベスト
-    personal_bests = {}
-    for pb_name, stat_id in PERSONAL_BEST_IDS.items():
-        personal_bests[pb_name] = get_stat_value(stats_dict, stat_id)
-    analysis["personal_bests"] = personal_bests
-    
-    # 実績進捗（統計データベース）
-    achievements = {}
-    for ach_name, stat_id in ACHIEVEMENT_IDS.items():
-        achievements[ach_name] = get_stat_value(stats_dict, stat_id)
-    analysis["achievements"] = achievements
-    
-    # コレクティブル実績
-    # collectibles = {}
-    # for map_name, stat_id in COLLECTIBLE_ACHIEVEMENTS.items():
-    #     collectibles[map_name] = get_stat_value(stats_dict, stat_id)
-    # analysis["collectibles"] = collectibles
-    
-    # 特別な統計
-    analysis["special_stats"] = {
-        "special_event_progress": get_stat_value(stats_dict, 300),
-        "weekly_event_progress": get_stat_value(stats_dict, 301),
-        "daily_event_info": get_stat_value(stats_dict, 302),
-        "dosh_vault_total": get_stat_value(stats_dict, 400),
-        "dosh_vault_progress": get_stat_value(stats_dict, 402),
-        "match_wins": get_stat_value(stats_dict, 3000),
-    }
-    
-    return analysis
+# 表示中のダッシュボードと選択中のタブを保持するセッションのキー
+DASHBOARD_STATE_KEY = "dashboard"
+DASHBOARD_TAB_KEY = "dashboard_tab"
+
+# ランキングの表示中フラグと、指標・表示人数の選択を保持するセッションのキー
+LEADERBOARD_STATE_KEY = "leaderboard"
+LEADERBOARD_METRIC_KEY = "leaderboard_metric"
+LEADERBOARD_TOP_KEY = "leaderboard_top"
+
+# 同じデータから作ったグラフを再実行のたびに作り直さないよう保持する時間と件数
+FIGURE_CACHE_TTL_SECONDS = 30 * 60
+FIGURE_CACHE_MAXSIZE = 64
+
+@memoize("figures.simple", key=lambda perks: ("perk_levels", perks), ttl=FIGURE_CACHE_TTL_SECONDS, maxsize=FIGURE_CACHE_MAXSIZE)
+def build_perk_level_figure(perks):
+    """PerkInfo のタプルからPerkレベル分布のグラフを作る"""
+    fig = px.bar(
+        x=[perk.name for perk in perks],
+        y=[perk.level for perk in perks],
+        title="Perkレベル分布",
+        labels={"x": "Perk", "y": "Level"}
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+@memoize("figures.simple", key=lambda active_kills: ("kill_distribution", active_kills), ttl=FIGURE_CACHE_TTL_SECONDS, maxsize=FIGURE_CACHE_MAXSIZE)
+def build_kill_distribution_figure(active_kills):
+    """(キル種別, キル数) のタプルからキル分布の円グラフを作る"""
+    return px.pie(
+        values=[count for _, count in active_kills],
+        names=[kill_type for kill_type, _ in active_kills],
+        title="キル分布"
+    )
 
-# --- UI表示関数 ---
+@memoize("figures.simple", key=lambda active_bests: ("personal_bests", active_bests), ttl=FIGURE_CACHE_TTL_SECONDS, maxsize=FIGURE_CACHE_MAXSIZE)
+def build_personal_best_figure(active_bests):
+    """(記録名, 値) のタプルからパーソナルベスト比較のグラフを作る"""
+    return px.bar(
+        x=[pb_name for pb_name, _ in active_bests],
+        y=[value for _, value in active_bests],
+        title="パーソナルベスト比較"
+    )
 
+@metrics.timed("render.perk_overview")
 def display_perk_overview(analysis):
     """Perk概要を表示する"""
     st.subheader("🎯 Perk概要")
@@ -322,15 +144,10 @@ def display_perk_overview(analysis):
     
     # Perkレベル分布のグラフ
     if len(perks) > 1:
-        fig = px.bar(
-            x=list(perks.keys()),
-            y=[perk["level"] for perk in perks.values()],
-            title="Perkレベル分布",
-            labels={"x": "Perk", "y": "Level"}
-        )
-        fig.update_layout(showlegend=False)
+        fig = build_perk_level_figure(perk_infos(analysis))
         st.plotly_chart(fig, use_container_width=True)
 
+@metrics.timed("render.kill_statistics")
 def display_kill_statistics(analysis):
     """キル統計を表示する"""
     st.subheader("👹 キル統計")
@@ -354,13 +171,10 @@ def display_kill_statistics(analysis):
     # キル分布のグラフ
     active_kills = {k: v for k, v in kills.items() if v > 0}
     if len(active_kills) > 1:
-        fig = px.pie(
-            values=list(active_kills.values()),
-            names=list(active_kills.keys()),
-            title="キル分布"
-        )
+        fig = build_kill_distribution_figure(tuple(active_kills.items()))
         st.plotly_chart(fig, use_container_width=True)
 
+@metrics.timed("render.personal_bests")
 def display_personal_bests(analysis):
     """パーソナルベストを表示する"""
     st.subheader("🏆 パーソナルベスト")
@@ -386,13 +200,10 @@ def display_personal_bests(analysis):
         
         # トップパフォーマンスのグラフ
         if len(pb_data) > 1:
-            fig = px.bar(
-                x=[item["記録"] for item in pb_data],
-                y=[int(item["値"].replace(",", "")) for item in pb_data],
-                title="パーソナルベスト比較"
-            )
+            fig = build_personal_best_figure(tuple((pb_name, value) for pb_name, value in personal_bests.items() if value > 0))
             st.plotly_chart(fig, use_container_width=True)
 
+@metrics.timed("render.achievement_progress")
 def display_achievement_progress(analysis, achievements_from_api, total_possible_achievements, achievements_schema):
     """実績進捗と達成済み実績リストを表示する"""
     st.subheader("🎖️ 実績進捗")
@@ -471,6 +282,7 @@ def display_achievement_progress(analysis, achievements_from_api, total_possible
 #         col_df = pd.DataFrame(col_data).sort_values(by="収集数", ascending=False)
 #         st.dataframe(col_df, use_container_width=True, hide_index=True)
 
+@metrics.timed("render.special_stats")
 def display_special_stats(analysis):
     """特別な統計を表示する"""
     st.subheader("🌟 特別な統計")
@@ -491,6 +303,68 @@ def display_special_stats(analysis):
         st.metric("DOSH Vault合計", f"{special_stats.get('dosh_vault_total', 0):,}")
         st.metric("DOSH Vault進捗", f"{special_stats.get('dosh_vault_progress', 0):,}")
 
+def format_eta(value, unit):
+    """予測時間を表示用の文字列にする（到達済みは「到達済み」、ペースが分からなければ「-」）"""
+    if value is None:
+        return "-"
+    if value <= 0:
+        return "到達済み"
+    return f"約 {value:,.1f} {unit}"
+
+def format_rate(rate, attribute):
+    """ProgressRate のペースを表示用の文字列にする"""
+    value = getattr(rate, attribute) if rate else None
+    return "-" if value is None else f"{value:,.1f}"
+
+@metrics.timed("render.progress_forecast")
+def display_progress_forecast(snapshot, analysis, total_possible_achievements):
+    """保存済みの履歴から求めたペースで、Perkのレベルと実績の目標に届くまでの時間を予測する"""
+    st.subheader("⏱️ 進捗予測")
+    rates = load_progress(snapshot.steam_id, snapshot.app_id)
+    if not any(rate.per_play_hour or rate.per_day for rate in rates.values()):
+        st.info("ペースを求めるには、戦績が変化した後にもう一度取得して履歴に保存する必要があります。ポーラーを使うと自動で記録されます。")
+        return
+    st.caption("「プレイ時間」はこのゲームを遊んだ時間、「日数」は遊んでいない日も含めた実際の日数です（直近のペースほど重く見ます）。")
+
+    kill_rate = rates.get("kills.総キル数")
+    win_rate = rates.get("special_stats.match_wins")
+    achievement_rate = rates.get("achievements.unlocked")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("キル数 / プレイ時間", format_rate(kill_rate, "per_play_hour"), help=f"1日あたり {format_rate(kill_rate, 'per_day')}")
+    col2.metric("勝利数 / プレイ時間", format_rate(win_rate, "per_play_hour"), help=f"1日あたり {format_rate(win_rate, 'per_day')}")
+    col3.metric("実績 / 日", format_rate(achievement_rate, "per_day"), help=f"プレイ時間1時間あたり {format_rate(achievement_rate, 'per_play_hour')}")
+
+    perk_rows = [
+        {
+            "Perk": row["perk"],
+            "レベル": row["level"],
+            "XP / プレイ時間": "-" if row["xp_per_play_hour"] is None else f"{row['xp_per_play_hour']:,.0f}",
+            "XP / 日": "-" if row["xp_per_day"] is None else f"{row['xp_per_day']:,.0f}",
+            "次のレベル（プレイ時間）": format_eta(row["next_level_hours"], "時間"),
+            "次のレベル（日数）": format_eta(row["next_level_days"], "日"),
+            f"Lv.{MAX_PERK_LEVEL}（プレイ時間）": format_eta(row["max_level_hours"], "時間"),
+            f"Lv.{MAX_PERK_LEVEL}（日数）": format_eta(row["max_level_days"], "日"),
+        }
+        for row in perk_forecast(analysis, rates)
+    ]
+    if perk_rows:
+        st.dataframe(pd.DataFrame(perk_rows), use_container_width=True, hide_index=True)
+
+    goals = achievement_forecast(len(snapshot.achievements), total_possible_achievements, achievement_rate)
+    if not goals:
+        st.info("全実績数が分からないため、実績の予測は表示できません。")
+        return
+    st.dataframe(pd.DataFrame([
+        {
+            "実績の解除率": f"{row['goal']}%",
+            "残りの実績": row["remaining"],
+            "プレイ時間": format_eta(row["hours"], "時間"),
+            "日数": format_eta(row["days"], "日"),
+        }
+        for row in goals
+    ]), use_container_width=True, hide_index=True)
+
+@metrics.timed("render.debug_info")
 def display_debug_info(stats_dict, schema_dict):
     """デバッグ情報を表示する"""
     with st.expander("🔍 デバッグ情報 (開発用)", expanded=False):
@@ -521,6 +395,257 @@ def display_debug_info(stats_dict, schema_dict):
         with col3:
             st.metric("ゼロ統計数", len(stats_dict) - non_zero_stats)
 
+def build_squad_table(squad, total_possible_achievements):
+    """一括取得した分析結果から、プレイヤーごとの比較表を作る"""
+    rows = []
+    for steam_id, result in squad.items():
+        if result is None:
+            continue
+        analysis = result["analysis"]
+        row = {"SteamID": steam_id}
+        for perk_name in PERK_STAT_IDS:
+            perk = analysis["perks"].get(perk_name)
+            row[perk_name] = perk["level"] if perk else 0
+        row.update(analysis["kills"])
+        row.update({f"PB: {pb_name}": value for pb_name, value in analysis["personal_bests"].items()})
+        row["マッチ勝利数"] = analysis["special_stats"]["match_wins"]
+        row["実績"] = f"{result['achieved']} / {total_possible_achievements}"
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def display_metrics_panel():
+    """処理段階ごとの所要時間・通信量・リトライ回数・キャッシュのヒット率を表示する"""
+    with st.expander("📈 パフォーマンス計測 (開発用)", expanded=False):
+        if st.button("計測値をリセット"):
+            metrics.reset()
+
+        snapshot = metrics.snapshot()
+        stages = snapshot["stages"]
+        counters = snapshot["counters"]
+        caches = snapshot["caches"]
+
+        # Steamの応答待ち（fetch.*）とアプリ内の処理（それ以外）を分けて合計する
+        steam_ms = sum(stage["total_ms"] for name, stage in stages.items() if name.startswith("fetch."))
+        local_ms = sum(stage["total_ms"] for name, stage in stages.items() if not name.startswith("fetch."))
+        hits = sum(cache["hits"] for cache in caches.values())
+        lookups = hits + sum(cache["misses"] for cache in caches.values())
+
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            st.metric("Steam通信の合計", f"{steam_ms:,.0f} ms")
+        with col2:
+            st.metric("アプリ内処理の合計", f"{local_ms:,.0f} ms")
+        with col3:
+            st.metric("受信データ量", f"{counters.get('http.bytes', 0) / 1024:,.1f} KiB")
+        with col4:
+            st.metric("リトライ / 通信エラー", f"{counters.get('http.retries', 0)} / {counters.get('http.errors', 0)}")
+        with col5:
+            st.metric("キャッシュヒット率", f"{hits / lookups * 100:.1f}%" if lookups else "-")
+
+        if not stages:
+            st.info("まだ計測値がありません。")
+            return
+
+        stage_df = pd.DataFrame([
+            {
+                "段階": name,
+                "回数": stage["count"],
+                "直近 (ms)": round(stage["last_ms"], 2),
+                "p50 (ms)": round(stage["p50_ms"], 2),
+                "p95 (ms)": round(stage["p95_ms"], 2),
+                "最大 (ms)": round(stage["max_ms"], 2),
+                "合計 (ms)": round(stage["total_ms"], 2),
+            }
+            for name, stage in stages.items()
+        ])
+        st.dataframe(stage_df, use_container_width=True, hide_index=True)
+
+        if caches:
+            cache_df = pd.DataFrame([
+                {
+                    "キャッシュ": name,
+                    "ヒット": cache["hits"],
+                    "ミス": cache["misses"],
+                    "ヒット率": f"{cache['hits'] / (cache['hits'] + cache['misses']) * 100:.1f}%" if cache["hits"] + cache["misses"] else "-",
+                    "件数": cache["size"],
+                }
+                for name, cache in caches.items()
+            ])
+            st.dataframe(cache_df, use_container_width=True, hide_index=True)
+
+        st.caption("カウンター: " + ", ".join(f"{name}={value:,}" for name, value in counters.items()))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Prometheus形式でダウンロード", metrics.to_prometheus(), file_name="kf2_metrics.prom", mime="text/plain")
+        with col2:
+            st.download_button("JSON Linesでダウンロード", metrics.to_jsonl(), file_name="kf2_metrics.jsonl", mime="application/jsonl")
+
+@metrics.timed("render.squad_comparison")
+def display_squad_comparison(squad, total_possible_achievements):
+    """複数プレイヤーのPerkレベル・キル数・パーソナルベストを比較表示する"""
+    st.subheader("👥 プレイヤー比較")
+
+    failed = [steam_id for steam_id, result in squad.items() if result is None]
+    if failed:
+        st.warning("戦績を取得できなかったプレイヤー: " + ", ".join(failed))
+
+    squad_df = build_squad_table(squad, total_possible_achievements)
+    if squad_df.empty:
+        st.info("比較できるプレイヤーがいません。")
+        return
+
+    st.dataframe(squad_df, use_container_width=True, hide_index=True)
+
+    # Perkレベルをプレイヤーごとに並べて比較
+    perk_levels = squad_df.melt(
+        id_vars="SteamID", value_vars=list(PERK_STAT_IDS), var_name="Perk", value_name="Level"
+    )
+    fig = px.bar(
+        perk_levels, x="Perk", y="Level", color="SteamID", barmode="group",
+        title="Perkレベル比較"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+def build_leaderboard_table(entries, metric, steam_id=None):
+    """(順位, SteamID, 値) のリストをランキング表にする"""
+    return pd.DataFrame([
+        {"順位": rank, "SteamID": other + (" ⭐" if other == steam_id else ""), LEADERBOARD_METRICS[metric]: value}
+        for rank, other, value in entries
+    ])
+
+def display_leaderboard(app_id, steam_id=None):
+    """履歴ストアに保存された全プレイヤーの指標ごとのランキングと、入力したプレイヤーの順位を表示する"""
+    st.subheader("🏅 ランキング")
+    leaderboard = get_leaderboard(app_id)
+    force = st.button("保存データを読み直す", help="ポーラーなどが保存した最新の戦績をすぐにランキングへ反映します。")
+    with st.spinner("保存データからランキングを更新中..."):
+        leaderboard.refresh(force=force)
+    if not len(leaderboard):
+        st.info("保存データがありません。ポーラーや「戦績を表示」で取得したプレイヤーがランキングに表示されます。")
+        return
+
+    col1, col2 = st.columns([3, 1])
+    metric = col1.selectbox("指標", list(LEADERBOARD_METRICS), format_func=LEADERBOARD_METRICS.get, key=LEADERBOARD_METRIC_KEY)
+    top_n = int(col2.number_input("表示人数", min_value=5, max_value=100, value=10, step=5, key=LEADERBOARD_TOP_KEY))
+
+    ranked = len(leaderboard.indexes[metric])
+    st.caption(f"保存データのある {len(leaderboard)} 人のうち {ranked} 人（値が 0 のプレイヤーは除く）")
+    if steam_id:
+        result = leaderboard.rank(metric, steam_id)
+        if result is None:
+            st.caption(f"{steam_id} はこの指標のランキングにいません。")
+        else:
+            rank, value, total = result
+            st.metric("あなたの順位", f"{rank} 位 / {total} 人", help=f"{LEADERBOARD_METRICS[metric]}: {value:,}")
+
+    if not ranked:
+        st.info("この指標の値があるプレイヤーはいません。")
+        return
+    st.dataframe(build_leaderboard_table(leaderboard.top(metric, top_n), metric, steam_id), use_container_width=True, hide_index=True)
+    if steam_id and result is not None and result[0] > top_n:
+        st.caption("あなたの前後の順位")
+        st.dataframe(build_leaderboard_table(leaderboard.around(metric, steam_id), metric, steam_id), use_container_width=True, hide_index=True)
+
+def dashboard_schema(dashboard, futures=None):
+    """ダッシュボードのスキーマを返す。取得中なら到着を待ち、以後の再実行用に保持する"""
+    if dashboard["schema"] is None:
+        with st.spinner("実績データを取得中..."):
+            if futures is None:
+                dashboard["schema"] = load_cached_schema(dashboard["snapshot"].app_id)
+            else:
+                dashboard["schema"] = collect_result(futures["schema"], EMPTY_GAME_SCHEMA, "ゲームスキーマ")
+    return dashboard["schema"]
+
+def format_snapshot_time(snapshot):
+    """スナップショットの取得（最終確認）日時を表示用の文字列にする"""
+    return datetime.fromtimestamp(snapshot.checked_at or snapshot.fetched_at).strftime("%Y-%m-%d %H:%M")
+
+@st.fragment(run_every=REVALIDATE_POLL_SECONDS)
+def display_revalidation_status():
+    """保存データを表示している間、バックグラウンドで取得中の最新戦績を定期的に確認する
+
+    内容が変わっていればダッシュボードを差し替えてページ全体を再実行し、
+    同じ内容ならそのまま表示を続ける。
+    """
+    dashboard = st.session_state.get(DASHBOARD_STATE_KEY)
+    if not dashboard or not dashboard.get("revalidation"):
+        return
+    status, snapshot = poll_revalidation(dashboard["revalidation"], dashboard["snapshot"])
+    if status == "pending":
+        st.info(f"🕒 {format_snapshot_time(dashboard['snapshot'])} 時点の保存データを表示しています。Steamから最新の戦績を確認中です…")
+        return
+
+    dashboard["revalidation"] = None
+    if status == "failed":
+        dashboard["notice"] = ("warning", f"Steamから戦績を取得できなかったため、{format_snapshot_time(snapshot)} 時点の保存データを表示しています。")
+    elif status == "unchanged":
+        dashboard["notice"] = ("success", f"{format_snapshot_time(snapshot)} にSteamで確認しました。保存データから変化はありません。")
+    else:
+        dashboard["snapshot"] = snapshot
+        # スキーマも裏で取得し直しているため、次の描画でキャッシュから読み直す
+        dashboard["schema"] = None
+        dashboard["notice"] = ("success", f"{format_snapshot_time(snapshot)} に取得した最新の戦績に更新しました。")
+        st.rerun(scope="app")
+    level, message = dashboard["notice"]
+    getattr(st, level)(message)
+
+def display_dashboard(dashboard, futures=None, show_debug=False, lazy_tabs=True):
+    """取得済みの戦績をタブに分けて表示する
+
+    lazy_tabs=True の場合は選択中のタブだけを描画し、タブを切り替えるとスクリプトを
+    再実行してそのタブを描画する。futures は取得直後の実行でだけ渡す（スキーマの到着待ち用）。
+    """
+    if dashboard.get("revalidation"):
+        display_revalidation_status()
+    elif dashboard["notice"]:
+        level, message = dashboard["notice"]
+        getattr(st, level)(message)
+
+    # データ分析
+    snapshot = dashboard["snapshot"]
+    analysis = analyze_kf2_stats(snapshot.stats)
+
+    # タブで情報を整理
+    tab_labels = ["🎯 Perk情報", "👹 キル統計", "🏆 パーソナルベスト", "🎖️ 実績進捗", "🌟 特別統計", "⏱️ 進捗予測"]
+    if lazy_tabs:
+        tabs = st.tabs(tab_labels, key=DASHBOARD_TAB_KEY, on_change="rerun")
+    else:
+        tabs = st.tabs(tab_labels)
+    tab1, tab2, tab3, tab4, tab5, tab6 = tabs
+
+    if not lazy_tabs or tab1.open:
+        with tab1:
+            display_perk_overview(analysis)
+
+    if not lazy_tabs or tab2.open:
+        with tab2:
+            display_kill_statistics(analysis)
+
+    if not lazy_tabs or tab3.open:
+        with tab3:
+            display_personal_bests(analysis)
+
+    # with tab5:
+    #     display_collectibles(analysis)
+    if not lazy_tabs or tab5.open:
+        with tab5:
+            display_special_stats(analysis)
+
+    # 実績タブはスキーマの到着を待ってから描画する
+    if not lazy_tabs or tab4.open:
+        with tab4:
+            schema = dashboard_schema(dashboard, futures)
+            display_achievement_progress(analysis, snapshot.achievements, schema.total_achievements, schema.achievements)
+
+    if not lazy_tabs or tab6.open:
+        with tab6:
+            display_progress_forecast(snapshot, analysis, dashboard_schema(dashboard, futures).total_achievements)
+
+    # デバッグ情報表示
+    if show_debug:
+        display_debug_info(snapshot.stats, dashboard_schema(dashboard, futures).stats)
+
 def render_sidebar():
     """サイドバーの入力欄とヘルプテキストを表示する"""
     st.sidebar.header("🔧 設定")
@@ -529,6 +654,10 @@ def render_sidebar():
     selected_game = st.sidebar.selectbox("ゲームを選択", list(GAME_APP_IDS.keys()))
     
     show_debug = st.sidebar.checkbox("デバッグ情報を表示", value=False)
+    use_stored = st.sidebar.checkbox("保存データから表示", value=False, help="Steamに問い合わせず、ポーラーなどが保存した最新の戦績を表示します。")
+    force_refresh = st.sidebar.checkbox("キャッシュを使わずに再取得", value=False, help="直近に取得した戦績・プレイ時間を使わず、Steamから取得し直します。")
+    lazy_tabs = st.sidebar.checkbox("選択中のタブだけ描画する", value=True, help="タブを切り替えた時にそのタブのグラフだけを作ります。オフにすると全タブを最初にまとめて描画します。")
+    revalidate = st.sidebar.checkbox("保存データを先に表示する", value=True, help="保存済みの戦績をすぐに表示し、Steamからの取得は裏で行います。内容が変わっていた時だけ表示を更新します。")
 
     st.sidebar.markdown("---")
     st.sidebar.info(
@@ -543,69 +672,137 @@ def render_sidebar():
         3. [steamid.io](https://steamid.io) 等のサイトでURLを検索し、`steamID64` を確認
         """
     )
-    return api_key, steam_id, selected_game, show_debug
+    return api_key, steam_id, selected_game, show_debug, use_stored, force_refresh, lazy_tabs, revalidate
+
+def render_schema_cache_controls(api_key, app_id):
+    """スキーマキャッシュの更新・削除ボタンをサイドバーに表示する"""
+    with st.sidebar.expander("🗂️ スキーマキャッシュ"):
+        cached = schema_cache.load(app_id)
+        if cached:
+            fetched_at = datetime.fromtimestamp(cached.fetched_at).strftime("%Y-%m-%d %H:%M")
+            st.caption(f"取得日時: {fetched_at}（実績 {cached.schema.total_achievements} 件）")
+        else:
+            st.caption("キャッシュはまだありません。")
+
+        col1, col2 = st.columns(2)
+        if col1.button("更新", help="Steamからスキーマを再取得してキャッシュします。"):
+            if not api_key:
+                st.error("APIキーを入力してください。")
+            else:
+                try:
+                    fetch_game_schema(api_key, app_id, force=True, client=request_scheduler.client())
+                    st.success("スキーマを更新しました。")
+                except requests.exceptions.RequestException as e:
+                    st.error(f"スキーマの更新に失敗しました: {e}")
+        if col2.button("削除", help="保存済みのスキーマを削除します。"):
+            schema_cache.purge(app_id)
+            st.success("キャッシュを削除しました。")
+
+def render_quota_status(api_key):
+    """APIキーの本日の呼び出し数をサイドバーに表示する"""
+    usage = load_quota_usage(api_key) if api_key else None
+    if usage is None:
+        return
+    used, limit = usage
+    st.sidebar.progress(min(1.0, used / limit) if limit else 1.0, text=f"本日のAPI呼び出し: {used:,} / {limit:,} 回")
+    if used >= limit:
+        st.sidebar.warning("APIキーの本日の呼び出し上限に達したため、保存データとキャッシュで表示します。")
+
+def render_squad_sidebar():
+    """一括比較用のSteam ID入力欄をサイドバーに表示する"""
+    with st.sidebar.expander("👥 一括比較"):
+        squad_text = st.text_area(
+            "比較するSteam ID",
+            help="64ビットSteam IDを1行に1つ（またはカンマ区切りで）入力します。",
+        )
+    return parse_steam_ids(squad_text)
 
 # --- Main App Logic ---
 
 st.set_page_config(page_title="KF2 Stats Viewer", layout="wide")
 st.title("🎮 Killing Floor 2 Stats Viewer")
 
-api_key, steam_id, selected_game, show_debug = render_sidebar()
+api_key, steam_id, selected_game, show_debug, use_stored, force_refresh, lazy_tabs, revalidate = render_sidebar()
+render_schema_cache_controls(api_key, GAME_APP_IDS[selected_game])
+render_quota_status(api_key)
+squad_ids = render_squad_sidebar()
 
-if st.sidebar.button("📊 戦績を表示", type="primary"):
-    if not api_key or not steam_id:
+show_clicked = st.sidebar.button("📊 戦績を表示", type="primary")
+squad_clicked = st.sidebar.button("👥 まとめて比較")
+leaderboard_clicked = st.sidebar.button("🏅 ランキング", help="ポーラーなどが保存した全プレイヤーの戦績から、指標ごとのランキングを表示します。")
+
+if show_clicked or squad_clicked or leaderboard_clicked:
+    # 新しく取得し直すので、表示中のダッシュボードは破棄する
+    st.session_state.pop(DASHBOARD_STATE_KEY, None)
+    # ランキングは指標を切り替えても表示し続け、他の表示に切り替えた時に閉じる
+    st.session_state[LEADERBOARD_STATE_KEY] = leaderboard_clicked
+
+if show_clicked:
+    if not steam_id or not (api_key or use_stored):
         st.sidebar.error("APIキーとSteam IDの両方を入力してください。")
     else:
         app_id = GAME_APP_IDS[selected_game]
         
         try:
-            with st.spinner(f"**{selected_game}** の戦績データを取得中..."):
-                player_stats = get_player_stats(api_key, steam_id, app_id)
-                playtime_minutes = get_player_playtime(api_key, steam_id, app_id)
-                total_possible_achievements = get_total_achievements(api_key, app_id)
-                schema_data = get_game_schema(api_key, app_id)
-                schema_dict = schema_data.get("stats", {})
-                achievements_schema = schema_data.get("achievements", {})
-                
-            if player_stats and "stats" in player_stats:
+            stale = None
+            if use_stored:
+                # ポーラーなどが保存したデータだけを使い、Steamには問い合わせない
+                futures = None
+                snapshot = None
+            else:
+                # 保存データがあれば先に表示し、Steamからの取得は実行が終わった後も裏で続ける
+                if revalidate:
+                    stale = load_latest_snapshot(steam_id, app_id)
+                # API呼び出しを同時に開始し、戦績データが届き次第描画を始める
+                futures = start_concurrent_fetch(api_key, steam_id, app_id, force_refresh=force_refresh)
+                if stale is not None and not finishes_soon(futures["snapshot"]):
+                    # 取得の続きはページの描画後に確認するので、ワーカーを今回の実行から切り離す
+                    futures.detach()
+                    snapshot = None
+                else:
+                    stale = None
+                    with st.spinner(f"**{selected_game}** の戦績データを取得中..."):
+                        snapshot = collect_result(futures["snapshot"], None, "戦績データ")
+
+            notice = None
+            is_live = snapshot is not None
+            if stale is not None:
+                # 取得の完了は display_revalidation_status が確認し、履歴への保存もそこで行う
+                snapshot = stale
+            elif not is_live:
+                # Steamから取得できなかった場合は保存済みの最新スナップショットを使う
+                snapshot = load_latest_snapshot(steam_id, app_id)
+                if snapshot:
+                    fetched_at = format_snapshot_time(snapshot)
+                    if use_stored:
+                        notice = ("info", f"{fetched_at} 時点の保存データを表示しています。")
+                    else:
+                        notice = ("warning", f"Steamから戦績を取得できなかったため、{fetched_at} 時点の保存データを表示しています。")
+
+            if snapshot is not None:
                 # st.header(f"📊 {selected_game} 詳細ダッシュボード")
                 # st.caption(f"SteamID: {steam_id} | 総プレイ時間: {playtime_minutes/60:.1f}時間")
-                
-                # 統計データの処理
-                stats_dict = {s['name']: s['value'] for s in player_stats["stats"]}
-                achievements_from_api = player_stats.get("achievements", [])
-                
-                # データ分析
-                analysis = analyze_kf2_stats(stats_dict)
-                
-                # タブで情報を整理
-                tab1, tab2, tab3, tab4, tab5 = st.tabs([
-                    "🎯 Perk情報", "👹 キル統計", "🏆 パーソナルベスト", 
-                    "🎖️ 実績進捗", "🌟 特別統計"
-                ])
-                
-                with tab1:
-                    display_perk_overview(analysis)
-                
-                with tab2:
-                    display_kill_statistics(analysis)
-                
-                with tab3:
-                    display_personal_bests(analysis)
-                
-                with tab4:
-                    display_achievement_progress(analysis, achievements_from_api, total_possible_achievements, achievements_schema)
-                
-                # with tab5:
-                #     display_collectibles(analysis)
-                
-                with tab5:
-                    display_special_stats(analysis)
-                
-                # デバッグ情報表示
-                if show_debug:
-                    display_debug_info(stats_dict, schema_dict)
+
+                # タブの切り替えなどで再実行されても取得し直さずに表示できるよう、セッションに保持する
+                dashboard = {
+                    "snapshot": snapshot,
+                    "schema": None,
+                    "notice": notice,
+                    "revalidation": futures if stale is not None else None,
+                }
+                st.session_state[DASHBOARD_STATE_KEY] = dashboard
+                # 保存データの表示中はスキーマの取得も待たず、ディスクキャッシュを使う
+                display_futures = None if stale is not None else futures
+                display_dashboard(dashboard, display_futures, show_debug=show_debug, lazy_tabs=lazy_tabs)
+                dashboard_schema(dashboard, display_futures)
+
+                # 取得した戦績を履歴に保存する
+                if is_live:
+                    playtime_minutes = collect_result(futures["playtime"], 0, "プレイ時間")
+                    save_snapshot(snapshot._replace(playtime_minutes=playtime_minutes))
          
+            elif use_stored:
+                st.error("このSteam IDの保存データがありません。ポーラーで取得するか、「保存データから表示」を外して取得してください。")
             else:
                 st.error("戦績データを取得できませんでした。以下の点をご確認ください:\n"
                          "- Steam IDとAPIキーが正しいか\n"
@@ -616,6 +813,35 @@ if st.sidebar.button("📊 戦績を表示", type="primary"):
             st.error(f"予期せぬエラーが発生しました: {e}")
             st.error("詳細なエラー情報については、デバッグモードを有効にしてもう一度お試しください。")
 
+elif DASHBOARD_STATE_KEY in st.session_state:
+    # タブの切り替えなどによる再実行では、同じプレイヤーの取得済みデータを描画し直す
+    dashboard = st.session_state[DASHBOARD_STATE_KEY]
+    if (dashboard["snapshot"].steam_id, dashboard["snapshot"].app_id) == (steam_id, GAME_APP_IDS[selected_game]):
+        try:
+            display_dashboard(dashboard, show_debug=show_debug, lazy_tabs=lazy_tabs)
+        except Exception as e:
+            st.error(f"予期せぬエラーが発生しました: {e}")
+            st.error("詳細なエラー情報については、デバッグモードを有効にしてもう一度お試しください。")
+
+if squad_clicked:
+    if not api_key or not squad_ids:
+        st.sidebar.error("APIキーと比較するSteam IDを入力してください。")
+    else:
+        app_id = GAME_APP_IDS[selected_game]
+        with st.spinner(f"{len(squad_ids)} 人分の **{selected_game}** の戦績データを取得中..."):
+            squad, total_possible_achievements = fetch_squad(api_key, squad_ids, app_id, force_refresh=force_refresh)
+        display_squad_comparison(squad, total_possible_achievements)
+
+if st.session_state.get(LEADERBOARD_STATE_KEY):
+    try:
+        display_leaderboard(GAME_APP_IDS[selected_game], steam_id)
+    except Exception as e:
+        st.error(f"ランキングの表示中にエラーが発生しました: {e}")
+
+# パフォーマンス計測（デバッグ情報と一緒に表示する）
+if show_debug:
+    display_metrics_panel()
+
 # フッター
 st.markdown("---")
 st.markdown("KF2 Stats Viewer")
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""kf2core.leaderboard の列指向の指標の抽出を、1件ずつの分析と突き合わせるテスト"""
+
+import random
+
+from kf2core.analysis import analyze_kf2_stats
+from kf2core.batch import analyze_frame
+from kf2core.constants import CUMULATIVE_XP_PER_LEVEL, KILL_STAT_IDS, PERK_STAT_IDS, PERSONAL_BEST_IDS
+from kf2core.leaderboard import frame_metric_values, metric_values
+
+
+def make_stats(rng):
+    """Perk・キル数・パーソナルベストの一部だけが入った stats_dict を1件作る"""
+    stats = {}
+    for ids in PERK_STAT_IDS.values():
+        xp = rng.choice([0, rng.randrange(1, CUMULATIVE_XP_PER_LEVEL[-1]), CUMULATIVE_XP_PER_LEVEL[-1] * 2])
+        stats[f"1_{ids['build']}"] = xp
+        if rng.random() < 0.8:
+            stats[f"1_{ids['progress']}"] = xp
+    for stat_id in [*KILL_STAT_IDS.values(), *PERSONAL_BEST_IDS.values()]:
+        if rng.random() < 0.5:
+            stats[f"1_{stat_id}"] = rng.randrange(0, 1000)
+    return stats
+
+
+def test_frame_metric_values_match_metric_values():
+    rng = random.Random(12)
+    stats_list = [make_stats(rng) for _ in range(300)] + [{}]
+    expected = [metric_values(analyze_kf2_stats(stats)) for stats in stats_list]
+    assert frame_metric_values(analyze_frame(stats_list)) == expected
@@ -0,0 +1,66 @@
+"""kf2core.perk_level の二分探索版・配列版を、以前の線形探索と突き合わせるテスト"""
+
+import random
+
+import numpy as np
+import pytest
+
+from kf2core.constants import CUMULATIVE_XP_PER_LEVEL
+from kf2core.perk_level import calculate_perk_level_arrays, calculate_perk_level_info
+
+
+def reference_perk_level_info(xp):
+    """二分探索に置き換える前の線形探索の実装（比較用にそのまま残す）"""
+    if xp >= CUMULATIVE_XP_PER_LEVEL[-1]:
+        return 25, 100.0, 0
+
+    level = 0
+    for i, required_xp in enumerate(CUMULATIVE_XP_PER_LEVEL):
+        if xp < required_xp:
+            level = i - 1
+            if level < 0:
+                level = 0
+
+            xp_for_current_level = CUMULATIVE_XP_PER_LEVEL[level]
+            progress_in_level = xp - xp_for_current_level
+            needed_for_levelup = required_xp - xp_for_current_level
+
+            if needed_for_levelup == 0:
+                progress_percent = 100.0
+            else:
+                progress_percent = (progress_in_level / needed_for_levelup) * 100
+
+            return level, progress_percent, required_xp - xp
+
+    return 0, 0.0, CUMULATIVE_XP_PER_LEVEL[1] - xp
+
+
+MAX_XP = CUMULATIVE_XP_PER_LEVEL[-1]
+
+# 各レベルの境界 ±1、負のXP、最大レベルちょうどとそれ以上
+EDGE_CASES = sorted(
+    {xp + delta for xp in CUMULATIVE_XP_PER_LEVEL for delta in (-1, 0, 1)}
+    | {-1, -2, -100, -MAX_XP, -(2 ** 40)}
+    | {MAX_XP, MAX_XP + 1, MAX_XP * 2, MAX_XP * 3 + 5, 2 ** 40}
+)
+
+RANDOM_CASES = [random.Random(13).randint(-MAX_XP, MAX_XP * 3) for _ in range(5000)]
+
+
+@pytest.mark.parametrize("xp", EDGE_CASES)
+def test_scalar_matches_reference_at_edges(xp):
+    assert calculate_perk_level_info(xp) == reference_perk_level_info(xp)
+
+
+def test_scalar_matches_reference_on_random_values():
+    for xp in RANDOM_CASES:
+        assert calculate_perk_level_info(xp) == reference_perk_level_info(xp), xp
+
+
+@pytest.mark.parametrize("cases", [EDGE_CASES, RANDOM_CASES], ids=["edges", "random"])
+def test_arrays_match_reference(cases):
+    levels, progress, next_level_xp = calculate_perk_level_arrays(np.array(cases, dtype=np.int64))
+    for xp, level, percent, remaining in zip(cases, levels, progress, next_level_xp):
+        expected_level, expected_percent, expected_remaining = reference_perk_level_info(xp)
+        assert (int(level), int(remaining)) == (expected_level, expected_remaining), xp
+        assert float(percent) == pytest.approx(expected_percent, rel=1e-12, abs=1e-9), xp